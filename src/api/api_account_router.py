@@ -5,9 +5,10 @@ API - ACCOUNT ROUTER
 """
 LIB
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-from api_db_connectors import query_for_informations, query_insert_values
+from api_db_connectors import query_for_informations, query_insert_values, get_table_version
+from api_responses import table_response, table_etag, is_not_modified, not_modified_response
 from api_vars import generate_uuid
 
 
@@ -70,24 +71,30 @@ async def app_get_existing_accounts(current_user: str = Depends(get_current_user
 
 # Load Account Table
 @account_router.get(f"/api/{api_version}/table/account", name="load_account_table", tags=['account'])
-async def app_load_account_table(current_user: str = Depends(get_current_user)) -> dict:
+async def app_load_account_table(request: Request, current_user: str = Depends(get_current_user)) -> dict:
     """
     Load the existing accounts with all information from the accounts table.
 
     Parameters:
+    - request (Request): The request, send "Accept: application/vnd.apache.arrow.stream" (or parquet) to get a columnar table.
     - current_user (str): The current user.
 
     Returns:
-    - dict: A dictionary containing the account table.
+    - dict: A dictionary containing the account table (or the Arrow / Parquet table), 304 without a body when the If-None-Match ETag is current.
 
     Raises:
     - HTTPException: If there is an error while loading the account table.
     """
+    # Unchanged table, no database scan
+    etag = table_etag(request, 'account', get_table_version('accounts'))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
     try:
         # Load existing accounts with all information from the accounts table
         results = await query_for_informations(request_to_do='get_existing_accounts', additional=None)
         account_table = [account for account in results]
-        return {'account table': account_table}
+        return table_response(request, 'account', account_table, etag=etag)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -125,14 +132,6 @@ async def app_create_account(account_name: str,
 
 
     try:
-        # Check if account name already exists
-        results = await query_for_informations(request_to_do='get_existing_accounts', additional = None)
-        existing_accounts = [result['name'] for result in results]
-
-        if account_name in existing_accounts:
-            raise HTTPException(status_code=400, detail="Account already exists")
-    
-
         # Generate unique ID for account
         account_id = await generate_uuid()
 
@@ -140,18 +139,24 @@ async def app_create_account(account_name: str,
         results = await query_for_informations(request_to_do='get_username_informations', additional=current_user)
         current_user_id = results[0]["id"]
 
-        # Insert new account into accounts table
+        # Insert new account into accounts table, skipped if the name already exists (unique index)
         account_informations = (account_id, account_name, account_type, account_balance, current_user_id)
-        await query_insert_values(request_to_do='create_new_account', additional=account_informations)
-
-
-        return {"message": f"Account {account_name} created successfully." \
-                            f"   Type: {account_type}, Balance: {account_balance}" \
-                            f"   Owner: {current_user}"}
+        results = await query_insert_values(request_to_do='create_new_account', additional=account_informations)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    if results is None:
+        raise HTTPException(status_code=500, detail="Could not create the account")
+
+    # Check if account name already exists
+    if not results:
+        raise HTTPException(status_code=400, detail="Account already exists")
+
+    return {"message": f"Account {account_name} created successfully." \
+                        f"   Type: {account_type}, Balance: {account_balance}" \
+                        f"   Owner: {current_user}"}
+
 
 
 
@@ -0,0 +1,174 @@
+"""
+API - ANALYTICS ROUTER
+"""
+
+"""
+LIB
+"""
+import calendar
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from api_db_connectors import query_analytics, query_time_series, query_unit_of_work
+
+
+"""
+VARS
+"""
+from api_vars import api_version
+from api_auth_router import get_current_user
+
+analytics_router = APIRouter()
+
+
+"""
+FILTERS
+"""
+def get_analytics_filters(transaction_type: str = None,
+                          year: int = None,
+                          month: str = None,
+                          weekday: str = None) -> dict:
+    """
+    Collects the filters shared by the analytics routes.
+
+    Parameters:
+    - transaction_type (str, optional): Keep transactions of this type.
+    - year (int, optional): Keep transactions made this year.
+    - month (str, optional): Keep transactions made this month, by English name (e.g. "January").
+    - weekday (str, optional): Keep transactions made this day of the week, by English name (e.g. "Monday").
+
+    Returns:
+    - dict: The filters, as expected by the database connectors.
+    """
+    return {
+        'transaction_type': transaction_type,
+        'year': year,
+        'month': month,
+        'weekday': weekday
+    }
+
+
+"""
+ANALYTICS ROUTES
+"""
+# Totals by category or recipient
+@analytics_router.get(f"/api/{api_version}/analytics/totals", name="get_analytics_totals", tags=['analytics'])
+async def app_get_analytics_totals(group_by: str = Query("category", pattern="^(category|recipient)$"),
+                                   filters: dict = Depends(get_analytics_filters),
+                                   current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Sum the transaction amounts by category or by recipient.
+
+    Parameters:
+    - group_by (str): "category" or "recipient".
+    - filters (dict): The type, year, month and weekday filters, see get_analytics_filters.
+    - current_user (str): The username of the current user.
+
+    Returns:
+    - dict: A dictionary containing one row per category (or recipient) with its amount, the largest first.
+
+    """
+    try:
+        totals = await query_analytics(group_by=[group_by], filters=filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {'totals': totals}
+
+
+# Totals by period & category
+@analytics_router.get(f"/api/{api_version}/analytics/temporal", name="get_analytics_temporal", tags=['analytics'])
+async def app_get_analytics_temporal(display_by: str = Query("month", pattern="^(year|month|weekday)$"),
+                                     filters: dict = Depends(get_analytics_filters),
+                                     current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Sum the transaction amounts by period (year, month or weekday) and category.
+
+    Parameters:
+    - display_by (str): "year", "month" or "weekday".
+    - filters (dict): The type, year, month and weekday filters, see get_analytics_filters.
+    - current_user (str): The username of the current user.
+
+    Returns:
+    - dict: A dictionary containing one row per period & category with its amount, the largest first.
+
+    """
+    try:
+        totals = await query_analytics(group_by=[display_by, 'category'], filters=filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {'totals': totals}
+
+
+# Available periods
+@analytics_router.get(f"/api/{api_version}/analytics/periods", name="get_analytics_periods", tags=['analytics'])
+async def app_get_analytics_periods(filters: dict = Depends(get_analytics_filters),
+                                    current_user: str = Depends(get_current_user)) -> dict:
+    """
+    List the years, months and weekdays having transactions, to build the analytics filters.
+
+    Parameters:
+    - filters (dict): The type, year, month and weekday filters, see get_analytics_filters.
+    - current_user (str): The username of the current user.
+
+    Returns:
+    - dict: A dictionary containing the years, months and weekdays, in calendar order.
+
+    """
+    try:
+        years = await query_analytics(group_by=['year'], filters=filters)
+        months = await query_analytics(group_by=['month'], filters=filters)
+        weekdays = await query_analytics(group_by=['weekday'], filters=filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    month_names = {row['month'] for row in months}
+    weekday_names = {row['weekday'] for row in weekdays}
+
+    return {'years': sorted(row['year'] for row in years),
+            'months': [month for month in calendar.month_name if month in month_names],
+            'weekdays': [weekday for weekday in calendar.day_name if weekday in weekday_names]}
+
+
+# Cumulative time series
+@analytics_router.get(f"/api/{api_version}/analytics/time_series", name="get_analytics_time_series", tags=['analytics'])
+async def app_get_analytics_time_series(filters: dict = Depends(get_analytics_filters),
+                                        current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Sum the transaction amounts per month, with the cumulative sum over time.
+
+    Parameters:
+    - filters (dict): The type, year, month and weekday filters, see get_analytics_filters.
+    - current_user (str): The username of the current user.
+
+    Returns:
+    - dict: A dictionary containing one row per month (year_month, amount, cumsum), the oldest first.
+
+    """
+    try:
+        time_series = await query_time_series(filters=filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {'time series': time_series}
+
+
+# Rebuild monthly rollup
+@analytics_router.post(f"/api/{api_version}/analytics/rollup/rebuild", name="rebuild_monthly_rollup", tags=['analytics'])
+async def app_rebuild_monthly_rollup(current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Rebuild the monthly rollup from the transaction table, after a backfill or a manual change of the transactions.
+
+    Parameters:
+    - current_user (str): The username of the current user.
+
+    Returns:
+    - dict: A dictionary with a message indicating the number of rollup rows.
+
+    """
+    try:
+        results = await query_unit_of_work(request_to_do='rebuild_monthly_rollup', additional=None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"message": f"Monthly rollup rebuilt successfully, {results['rollup_rows']} rows."}
@@ -5,12 +5,19 @@ API - AUTH ROUTER
 """
 LIB
 """
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import hashlib
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
 import jwt
+import threading
+import time
 
-from api_db_connectors import query_for_informations
+from api_db_connectors import query_for_informations, query_insert_values
+from api_metrics import observe_password_hashing
 from api_main import limiter
 
 
@@ -18,8 +25,172 @@ from api_main import limiter
 VARS
 """
 from api_vars import oauth2_scheme, algorithm, jwt_secret_key, access_token_expiration, pwd_context, authorized_users, api_version, auth_limit
+from api_vars import password_hashing_workers, password_hashing_concurrency, token_cache_size
 auth_router = APIRouter()
 
+# Verified token claims by token digest (LRU order), and revoked token digests with their expiration
+token_cache = OrderedDict()
+revoked_tokens = {}
+token_cache_stats = {'hits': 0, 'misses': 0}
+token_cache_lock = threading.Lock() # get_current_user is a sync dependency, run in the threadpool
+
+# argon2 releases the GIL while hashing, threads are enough to keep the event loop free
+password_hashing_executor = ThreadPoolExecutor(max_workers=password_hashing_workers, thread_name_prefix="password_hashing")
+password_hashing_semaphore = asyncio.Semaphore(password_hashing_concurrency)
+
+
+"""
+PASSWORD HASHING
+"""
+def timed_call(function, *args) -> tuple:
+    """
+    Calls a function, returns its result and its duration (seconds).
+    """
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+async def run_password_hashing(function, *args):
+    """
+    Runs a password hashing function in the hashing thread pool, at most `password_hashing_concurrency` at a time,
+    and records its duration (see api_metrics).
+
+    Parameters:
+    - function: The pwd_context function to run (hash, verify_and_update...).
+    - *args: The arguments of the function.
+
+    Returns:
+    - The result of the function.
+    """
+    async with password_hashing_semaphore:
+        loop = asyncio.get_running_loop()
+        result, elapsed = await loop.run_in_executor(password_hashing_executor, timed_call, function, *args)
+
+    observe_password_hashing(function.__name__, elapsed)
+    return result
+
+
+async def verify_password(username: str, password: str, hashed_password: str) -> bool:
+    """
+    Verifies a password against its hash, and stores a new hash when the hash uses a deprecated scheme or outdated parameters.
+
+    Parameters:
+    - username (str): The username, to store the new hash.
+    - password (str): The password to verify.
+    - hashed_password (str): The stored hash.
+
+    Returns:
+    - bool: True if the password is correct.
+    """
+    is_valid, new_hash = await run_password_hashing(pwd_context.verify_and_update, password, hashed_password)
+
+    if is_valid and new_hash is not None:
+        await query_insert_values(request_to_do='update_user_password', additional=(username, new_hash))
+
+    return is_valid
+
+
+"""
+TOKEN CACHE
+"""
+def get_token_digest(token: str) -> str:
+    """
+    Returns the SHA-256 digest of a token, the tokens themselves are never kept in memory.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_cached_claims(token_digest: str, now: float):
+    """
+    Returns the cached claims of a token, None if the token is not cached or has expired (the entry is then evicted).
+
+    Parameters:
+    - token_digest (str): The digest of the token.
+    - now (float): The current timestamp.
+
+    Returns:
+    - dict or None: The decoded claims.
+    """
+    with token_cache_lock:
+        claims = token_cache.get(token_digest)
+        if claims is None:
+            return None
+
+        if claims.get("exp", 0) <= now:
+            del token_cache[token_digest]
+            return None
+
+        token_cache.move_to_end(token_digest)
+        return claims
+
+
+def cache_claims(token_digest: str, claims: dict) -> None:
+    """
+    Caches verified claims, evicting the least recently used token when the cache is full.
+
+    Parameters:
+    - token_digest (str): The digest of the token.
+    - claims (dict): The decoded claims, with their "exp".
+    """
+    with token_cache_lock:
+        token_cache[token_digest] = claims
+        token_cache.move_to_end(token_digest)
+        while len(token_cache) > token_cache_size:
+            token_cache.popitem(last=False)
+
+
+def revoke_tokens(token: str = None) -> int:
+    """
+    Revocation hook: purges a token from the cache and rejects it until it expires (logout),
+    or purges every cached token when no token is given (key rotation, the tokens are verified again).
+
+    Parameters:
+    - token (str, optional): The token to revoke.
+
+    Returns:
+    - int: The number of purged cache entries.
+    """
+    if token is None:
+        with token_cache_lock:
+            purged = len(token_cache)
+            token_cache.clear()
+        return purged
+
+    token_digest = get_token_digest(token)
+    try:
+        expiration = jwt.decode(token, options={"verify_signature": False}).get("exp", 0)
+    except jwt.PyJWTError:
+        expiration = 0
+
+    with token_cache_lock:
+        revoked_tokens[token_digest] = expiration
+
+        # Forget revocations of tokens that have expired anyway
+        now = time.time()
+        for revoked_digest in [digest for digest, revoked_expiration in revoked_tokens.items() if revoked_expiration <= now]:
+            del revoked_tokens[revoked_digest]
+
+        return 1 if token_cache.pop(token_digest, None) is not None else 0
+
+
+def get_token_cache_stats() -> dict:
+    """
+    Returns the token cache counters.
+
+    Returns:
+    - dict: The hits, misses, hit ratio, cached and revoked token counts.
+    """
+    lookups = token_cache_stats['hits'] + token_cache_stats['misses']
+    return {
+        'hits': token_cache_stats['hits'],
+        'misses': token_cache_stats['misses'],
+        'hit_ratio': round(token_cache_stats['hits'] / lookups, 4) if lookups else 0.0,
+        'cached_tokens': len(token_cache),
+        'max_cached_tokens': token_cache_size,
+        'revoked_tokens': len(revoked_tokens)
+    }
+
 
 """
 AUTH Routes
@@ -27,6 +198,7 @@ AUTH Routes
 def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Retrieves the current user based on the provided token.
+    Verified tokens are cached until they expire, so repeated requests skip the signature verification.
 
     Parameters:
     - token (str): The authentication token.
@@ -41,13 +213,25 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"})
-    
+
+    token_digest = get_token_digest(token)
+    if token_digest in revoked_tokens:
+        raise credentials_exception
+
+    claims = get_cached_claims(token_digest, time.time())
+    if claims is not None:
+        token_cache_stats['hits'] += 1
+        return claims.get("sub")
+
+    token_cache_stats['misses'] += 1
     try:
         payload = jwt.decode(token, jwt_secret_key, algorithms=[algorithm])
         username = payload.get("sub")
     except Exception as e:
         print(f"An error occurred while decoding the token: {e}")
         raise credentials_exception
+
+    cache_claims(token_digest, payload)
     
     return username
 
@@ -85,7 +269,7 @@ async def log_user(request: Request, credentials: OAuth2PasswordRequestForm = De
 
 
     # The password should be correct
-    if not pwd_context.verify(credentials.password, results[0]['password']):
+    if not await verify_password(credentials.username, credentials.password, results[0]['password']):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
 
@@ -96,4 +280,22 @@ async def log_user(request: Request, credentials: OAuth2PasswordRequestForm = De
 
     encoded_jwt = jwt.encode(data__to_encode, jwt_secret_key, algorithm=algorithm)
 
-    return {"access_token": encoded_jwt}
\ No newline at end of file
+    return {"access_token": encoded_jwt}
+
+
+
+@auth_router.post(f"/api/{api_version}/logout", name="logout", tags=['auth'])
+async def log_out_user(token: str = Depends(oauth2_scheme), current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Revokes the access token of the current user, it is rejected until it expires.
+
+    Args:
+        token (str): The access token to revoke.
+        current_user (str): The username of the current user.
+
+    Returns:
+        dict: A dictionary with a message indicating the logout.
+    """
+    revoke_tokens(token)
+
+    return {"message": f"User {current_user} logged out successfully."}
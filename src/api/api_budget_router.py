@@ -5,9 +5,10 @@ API - BUDGET ROUTER
 """
 LIB
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
-from api_db_connectors import query_for_informations, query_insert_values
+from api_db_connectors import query_for_informations, query_insert_values, get_table_version, get_default_budget_id
+from api_responses import table_response, table_etag, is_not_modified, not_modified_response
 from api_vars import generate_uuid
 
 
@@ -44,21 +45,27 @@ async def app_get_available_budgets(current_user: str = Depends(get_current_user
 
 # Load Budget Table
 @budget_router.get(f"/api/{api_version}/table/budget", name="load_budget_table", tags=['budget'])
-async def app_load_budget_table(current_user: str = Depends(get_current_user)) -> dict:
+async def app_load_budget_table(request: Request, current_user: str = Depends(get_current_user)) -> dict:
     """
     Load the existing budgets with all information from the budget table.
 
     Parameters:
+    - request (Request): The request, send "Accept: application/vnd.apache.arrow.stream" (or parquet) to get a columnar table.
     - current_user (str): The username of the current user.
 
     Returns:
-    - dict: A dictionary containing the budget table.
+    - dict: A dictionary containing the budget table (or the Arrow / Parquet table), 304 without a body when the If-None-Match ETag is current.
 
     """
+    # Unchanged table, no database scan
+    etag = table_etag(request, 'budget', get_table_version('budgets'))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
     # Load existing budgets with all information from the budget table
     results = await query_for_informations(request_to_do='get_existing_budgets', additional=None)
     budget_table = [budget for budget in results if budget['name'] != 'default'] # Remove default budget from the list
-    return {'budget table': budget_table}
+    return table_response(request, 'budget', budget_table, etag=etag)
 
 
 
@@ -88,27 +95,64 @@ async def app_create_budget(budget_name: str,
     if budget_amount <0:
         raise HTTPException(status_code=400, detail="Budget balance must be positive")
 
-    # Check if budget name already exists (at a precise month)
-    results = await query_for_informations(request_to_do='get_existing_budgets', additional = None)
-
-    # Get budget name & month
-    existing_budget_names_and_months = [(budget['name'], budget['month']) for budget in results]
-
-    if (budget_name, budget_month) in existing_budget_names_and_months:
-        raise HTTPException(status_code=400, detail="Budget already exists")
-
-
     # Generate unique ID for budget
     budget_id = await generate_uuid()
 
-    # Insert new budget into budget table
+    # Insert new budget into budget table, skipped if the name already exists at this month (unique index)
     budget_informations = (budget_id, budget_name, budget_month, budget_amount)
-    await query_insert_values(request_to_do='create_new_budget', additional=budget_informations)
+    results = await query_insert_values(request_to_do='create_new_budget', additional=budget_informations)
+
+    if results is None:
+        raise HTTPException(status_code=500, detail="Could not create the budget")
+
+    # Check if budget name already exists (at a precise month)
+    if not results:
+        raise HTTPException(status_code=400, detail="Budget already exists")
 
     return {"message": f"Budget {budget_name} created successfully." \
                         f"   Month: {budget_month}, Balance: {budget_amount}"}
 
 
+# Rollover Budgets
+@budget_router.post(f"/api/{api_version}/budget/rollover", name="rollover_budgets", tags=['budget'])
+async def app_rollover_budgets(source_month: str,
+                               target_month: str,
+                               carry_over: bool = False,
+                               current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Copy every budget of a month to another month, in one statement.
+
+    Each new budget gets the amount allocated at the source month (remaining amount + spent amount),
+    plus the unspent amount of the source budget when carry_over is set. Budgets already existing at the target month are skipped,
+    so the rollover can be sent again safely.
+
+    Parameters:
+    - source_month (str): The month to copy the budgets from.
+    - target_month (str): The month to create the budgets at.
+    - carry_over (bool, optional): Add the unspent amount (never negative) of each source budget. Defaults to False.
+    - current_user (str, optional): The current user. Defaults to the result of the `get_current_user` function.
+
+    Returns:
+    - dict: A dictionary with a message and the created budgets.
+
+    Raises:
+    - HTTPException: If the source and target months are the same, or if the budgets could not be created.
+
+    """
+    if source_month.strip().lower() == target_month.strip().lower():
+        raise HTTPException(status_code=400, detail="Source and target months must be different")
+
+    results = await query_insert_values(request_to_do='rollover_budgets', additional=(source_month, target_month, carry_over, get_default_budget_id()))
+
+    if results is None:
+        raise HTTPException(status_code=500, detail="Could not roll the budgets over")
+
+    budget_table = [dict(budget) for budget in results]
+
+    return {"message": f"{len(budget_table)} budgets rolled over from {source_month} to {target_month}.",
+            "budget table": budget_table}
+
+
 # Delete Budget
 @budget_router.delete(f"/api/{api_version}/delete/budget", name="delete_budget", tags=['budget'])
 async def app_delete_budget(budget_id: str, current_user: str = Depends(get_current_user)) -> dict:
@@ -6,8 +6,15 @@ PostGres Database connectors for the API
 """
 LIBS
 """
+import asyncio
 import asyncpg
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 import os
+import time
+
+from api_metrics import observe_query
 
 
 """
@@ -21,22 +28,559 @@ postgres_user = os.getenv('POSTGRES_USER', 'root')
 postgres_password = os.getenv('POSTGRES_PASSWORD', 'root')
 postgres_db = os.getenv('POSTGRES_DB', 'bank_db')
 
+# Connection pool
+postgres_pool_min_size = int(os.getenv('POSTGRES_POOL_MIN_SIZE', 2))
+postgres_pool_max_size = int(os.getenv('POSTGRES_POOL_MAX_SIZE', 10))
+postgres_pool_acquire_timeout = float(os.getenv('POSTGRES_POOL_ACQUIRE_TIMEOUT', 10))
+postgres_pool_max_inactive_lifetime = float(os.getenv('POSTGRES_POOL_MAX_INACTIVE_LIFETIME', 300))
+
+pool = None
+pool_usage = {'waiters': 0, 'acquire_timeouts': 0} # Requests waiting for a connection, acquisitions that timed out
+default_budget_id = None # Resolved once at startup, see load_default_budget_id
+
+# Transaction filters, column condition for each accepted filter ({0} is the parameter placeholder)
+transaction_filters = {
+    'start_date': 'date >= {0}',
+    'end_date': 'date < {0}',
+    'transaction_type': 'type = {0}',
+    'account': '(origin_account = {0} OR destination_account = {0})',
+    'budget': 'budget = {0}',
+    'category': 'category = {0}',
+    'recipient': 'recipient = {0}',
+    'year': 'date >= make_date({0}, 1, 1) AND date < make_date({0} + 1, 1, 1)',
+    'month': "to_char(date, 'FMMonth') = {0}",
+    'weekday': "to_char(date, 'FMDay') = {0}"
+}
+
+# Filters & groups the monthly rollup can answer, analytics use it instead of the transactions when possible
+rollup_filters = {
+    'transaction_type': 'type = {0}',
+    'year': 'month >= make_date({0}, 1, 1) AND month < make_date({0} + 1, 1, 1)',
+    'month': "to_char(month, 'FMMonth') = {0}"
+}
+rollup_groups = {
+    'category': "NULLIF(category, '')",
+    'year': "to_char(month, 'YYYY')",
+    'month': "to_char(month, 'FMMonth')"
+}
+
+# Analytics groups, SQL expression of each accepted group (month & weekday names are always in English)
+# Categories & recipients are grouped by dictionary id, the names are set back from the dictionary cache
+analytics_groups = {
+    'category': 'category_id',
+    'recipient': 'recipient_id',
+    'year': "to_char(date, 'YYYY')",
+    'month': "to_char(date, 'FMMonth')",
+    'weekday': "to_char(date, 'FMDay')"
+}
+
+
+"""
+QUERY REGISTRY
+"""
+# Named statements, prepared once per pooled connection (see execute_registered_query)
+queries = {
+    # Reads
+    'get_username_informations': "SELECT * FROM users WHERE username=$1",
+    'get_existing_accounts': 'SELECT * FROM accounts',
+    'get_existing_budgets': 'SELECT * FROM budgets',
+    # Served by the unique (lower(trim(name)), lower(trim(month))) index of init.sql
+    'get_budget_id_by_name_and_month': 'SELECT id FROM budgets WHERE lower(trim(name)) = lower(trim($1)) AND lower(trim(month)) = lower(trim($2))',
+    'get_default_budget_id': "SELECT id FROM budgets WHERE lower(trim(name)) = 'default' AND lower(trim(month)) = 'n/a'",
+    # Dictionaries, maintained by the transactions trigger of init.sql
+    'get_categories': 'SELECT id, name FROM categories',
+    'get_recipients': 'SELECT id, name FROM recipients',
+
+    # Writes
+    'update_user_password': 'UPDATE users SET password=$2 WHERE username=$1',
+    # Duplicates are rejected by the unique indexes of init.sql, no row is returned then
+    'create_new_account': 'INSERT INTO accounts (id, name, type, balance, owner) VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING RETURNING id',
+    'delete_account': 'DELETE FROM accounts WHERE id=$1',
+    'create_new_budget': 'INSERT INTO budgets (id, name, month, amount) VALUES ($1, $2, $3, $4) ON CONFLICT DO NOTHING RETURNING id',
+    'delete_budget': 'DELETE FROM budgets WHERE id=$1',
+    # $1 : source month, $2 : target month, $3 : carry over the unspent amounts, $4 : default budget id (never copied)
+    # amount is what remains of a budget, the allocated amount is the remaining amount + what its transactions spent
+    'rollover_budgets': """
+        INSERT INTO budgets (id, name, month, amount)
+        SELECT gen_random_uuid(), b.name, $2,
+               b.amount + COALESCE(s.spent, 0) + CASE WHEN $3 THEN GREATEST(b.amount, 0) ELSE 0 END
+        FROM budgets b
+        LEFT JOIN LATERAL (SELECT SUM(t.amount) AS spent FROM transactions t WHERE t.budget = b.id) s ON TRUE
+        WHERE lower(trim(b.month)) = lower(trim($1)) AND b.id <> $4
+        ON CONFLICT DO NOTHING
+        RETURNING *
+    """,
+    # $1 : account ids, $2 : net balance change of each account
+    'apply_account_deltas': """
+        UPDATE accounts
+        SET balance = accounts.balance + d.delta
+        FROM unnest($1::uuid[], $2::float8[]) AS d(id, delta)
+        WHERE accounts.id = d.id
+    """,
+    # $1 : budget ids, $2 : net amount change of each budget
+    'apply_budget_deltas': """
+        UPDATE budgets
+        SET amount = budgets.amount + d.delta
+        FROM unnest($1::uuid[], $2::float8[]) AS d(id, delta)
+        WHERE budgets.id = d.id
+    """,
+    # $1 : ids of the transactions to add to the monthly rollup, $2 : default budget id
+    'apply_transactions_to_rollup': """
+        INSERT INTO transaction_monthly_rollup AS r (month, category, account, budget, type, amount, transaction_count)
+        SELECT date_trunc('month', date)::date,
+               COALESCE(category, ''),
+               COALESCE(CASE WHEN type = 'credit' THEN destination_account ELSE origin_account END, ''),
+               COALESCE(budget, $2),
+               type, SUM(amount), COUNT(*)
+        FROM transactions
+        WHERE id = ANY($1::uuid[])
+        GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (month, category, account, budget, type)
+        DO UPDATE SET amount = r.amount + EXCLUDED.amount, transaction_count = r.transaction_count + EXCLUDED.transaction_count
+    """,
+
+    # Units of work
+    'rebuild_monthly_rollup': 'SELECT rebuild_transaction_monthly_rollup() AS rollup_rows',
+    # $1..$10 : transaction values, $11 : default budget id (never adjusted)
+    # The account ids are resolved once by name (unique accounts_name_idx), the balances are then updated by primary key
+    'create_transaction': """
+        WITH new_transaction AS (
+            INSERT INTO transactions (id, date, type, amount, origin_account, destination_account, budget, category, recipient, description,
+                                      origin_account_id, destination_account_id)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10,
+                    (SELECT id FROM accounts WHERE name = $5),
+                    (SELECT id FROM accounts WHERE name = $6))
+            RETURNING date, type, amount, origin_account, destination_account, origin_account_id, destination_account_id, budget, category
+        ),
+        account_deltas AS (
+            SELECT origin_account_id AS id, -amount AS delta FROM new_transaction WHERE type IN ('debit', 'transfert')
+            UNION ALL
+            SELECT destination_account_id AS id, amount AS delta FROM new_transaction WHERE type IN ('credit', 'transfert')
+        ),
+        account_update AS (
+            UPDATE accounts
+            SET balance = accounts.balance + d.delta
+            FROM (SELECT id, SUM(delta) AS delta FROM account_deltas WHERE id IS NOT NULL GROUP BY id) d
+            WHERE accounts.id = d.id
+            RETURNING accounts.id
+        ),
+        budget_update AS (
+            UPDATE budgets
+            SET amount = budgets.amount - t.amount
+            FROM new_transaction t
+            WHERE budgets.id = t.budget AND budgets.id <> $11
+            RETURNING budgets.id
+        ),
+        rollup_update AS (
+            INSERT INTO transaction_monthly_rollup AS r (month, category, account, budget, type, amount, transaction_count)
+            SELECT date_trunc('month', t.date)::date,
+                   COALESCE(t.category, ''),
+                   COALESCE(CASE WHEN t.type = 'credit' THEN t.destination_account ELSE t.origin_account END, ''),
+                   COALESCE(t.budget, $11),
+                   t.type, t.amount, 1
+            FROM new_transaction t
+            ON CONFLICT (month, category, account, budget, type)
+            DO UPDATE SET amount = r.amount + EXCLUDED.amount, transaction_count = r.transaction_count + 1
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM new_transaction) AS transactions,
+               (SELECT count(*) FROM account_update) AS accounts,
+               (SELECT count(*) FROM budget_update) AS budgets
+    """,
+    # $1 : transaction id, $2 : default budget id (never adjusted)
+    'delete_transaction': """
+        WITH deleted_transaction AS (
+            DELETE FROM transactions
+            WHERE id = $1
+            RETURNING date, type, amount, origin_account, destination_account, origin_account_id, destination_account_id, budget, category
+        ),
+        account_deltas AS (
+            SELECT origin_account_id AS id, amount AS delta FROM deleted_transaction WHERE type IN ('debit', 'transfert')
+            UNION ALL
+            SELECT destination_account_id AS id, -amount AS delta FROM deleted_transaction WHERE type IN ('credit', 'transfert')
+        ),
+        account_update AS (
+            UPDATE accounts
+            SET balance = accounts.balance + d.delta
+            FROM (SELECT id, SUM(delta) AS delta FROM account_deltas WHERE id IS NOT NULL GROUP BY id) d
+            WHERE accounts.id = d.id
+            RETURNING accounts.id
+        ),
+        budget_update AS (
+            UPDATE budgets
+            SET amount = budgets.amount + t.amount
+            FROM deleted_transaction t
+            WHERE budgets.id = t.budget AND budgets.id <> $2
+            RETURNING budgets.id
+        ),
+        rollup_update AS (
+            UPDATE transaction_monthly_rollup AS r
+            SET amount = r.amount - t.amount, transaction_count = r.transaction_count - 1
+            FROM deleted_transaction t
+            WHERE r.month = date_trunc('month', t.date)::date
+              AND r.category = COALESCE(t.category, '')
+              AND r.account = COALESCE(CASE WHEN t.type = 'credit' THEN t.destination_account ELSE t.origin_account END, '')
+              AND r.budget = COALESCE(t.budget, $2)
+              AND r.type = t.type
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM deleted_transaction) AS transactions,
+               (SELECT count(*) FROM account_update) AS accounts,
+               (SELECT count(*) FROM budget_update) AS budgets
+    """
+}
+
+# Bulk delete of the transactions matching {conditions}, $1 : default budget id (never adjusted)
+# The deleted rows are reversed with one aggregated UPDATE per table, in the same statement
+bulk_delete_transactions_query = """
+    WITH deleted_transactions AS (
+        DELETE FROM transactions
+        WHERE {conditions}
+        RETURNING date, type, amount, origin_account, destination_account, origin_account_id, destination_account_id, budget, category
+    ),
+    account_deltas AS (
+        SELECT d.id, SUM(d.delta) AS delta
+        FROM (
+            SELECT origin_account_id AS id, amount AS delta FROM deleted_transactions WHERE type IN ('debit', 'transfert')
+            UNION ALL
+            SELECT destination_account_id AS id, -amount AS delta FROM deleted_transactions WHERE type IN ('credit', 'transfert')
+        ) d
+        WHERE d.id IS NOT NULL
+        GROUP BY d.id
+    ),
+    account_update AS (
+        UPDATE accounts
+        SET balance = accounts.balance + d.delta
+        FROM account_deltas d
+        WHERE accounts.id = d.id
+        RETURNING accounts.id
+    ),
+    budget_update AS (
+        UPDATE budgets
+        SET amount = budgets.amount + d.delta
+        FROM (SELECT budget, SUM(amount) AS delta FROM deleted_transactions WHERE budget <> $1 GROUP BY budget) d
+        WHERE budgets.id = d.budget
+        RETURNING budgets.id
+    ),
+    rollup_update AS (
+        UPDATE transaction_monthly_rollup AS r
+        SET amount = r.amount - d.amount, transaction_count = r.transaction_count - d.transaction_count
+        FROM (
+            SELECT date_trunc('month', date)::date AS month,
+                   COALESCE(category, '') AS category,
+                   COALESCE(CASE WHEN type = 'credit' THEN destination_account ELSE origin_account END, '') AS account,
+                   COALESCE(budget, $1) AS budget,
+                   type, SUM(amount) AS amount, COUNT(*) AS transaction_count
+            FROM deleted_transactions
+            GROUP BY 1, 2, 3, 4, 5
+        ) d
+        WHERE r.month = d.month AND r.category = d.category AND r.account = d.account AND r.budget = d.budget AND r.type = d.type
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM deleted_transactions) AS transactions,
+           (SELECT count(*) FROM account_update) AS accounts,
+           (SELECT count(*) FROM budget_update) AS budgets
+"""
+
+# Prepared statements, by server process id of the pooled connection, then by request_to_do
+# (dropped when the connection closes, see init_connection)
+prepared_statements = {}
+
+# Latency & row count stats, by request_to_do
+query_stats = {}
+query_stats_samples = int(os.getenv('QUERY_STATS_SAMPLES', 1000)) # Latencies kept per query to compute the p95
+
+# Category & recipient dictionaries (id to name), loaded on first use, reloaded after writes of the transactions
+dictionary_cache = {'categories': None, 'recipients': None}
+dictionary_groups = {'category': 'categories', 'recipient': 'recipients'}
+
+# Version of each table served by the API, bumped once a write is committed (ETags of the table routes)
+table_versions = {'accounts': 0, 'budgets': 0, 'transactions': 0}
+# Tables changed by each write, a write not listed here changes every table
+written_tables = {
+    'update_user_password': (),
+    'rebuild_monthly_rollup': (),
+    'create_new_account': ('accounts',),
+    'delete_account': ('accounts', 'transactions'), # The account ids of its transactions are set to NULL
+    'create_new_budget': ('budgets',),
+    'delete_budget': ('budgets',),
+    'rollover_budgets': ('budgets',)
+}
+
+# Database time of the current request, [seconds, query count], started by the timing middleware of api_main
+request_db_time = ContextVar('request_db_time', default=None)
+
 
 """
 FUCNTIONS
 """
-async def connect_to_db() -> asyncpg.connection:
+async def init_connection(connection: asyncpg.connection) -> None:
+    """
+    Called by the pool for every new connection, starts its prepared statements (replacing the ones of a previous
+    connection with the same server process id) and drops them once the connection is closed by the pool.
+
+    Args:
+        connection (asyncpg.connection): The new connection.
+    """
+    server_pid = connection.get_server_pid()
+    statements = prepared_statements[server_pid] = {}
+
+    def drop_prepared_statements(closed_connection: asyncpg.connection) -> None:
+        # A newer connection may already use the same server process id
+        if prepared_statements.get(server_pid) is statements:
+            del prepared_statements[server_pid]
+
+    connection.add_termination_listener(drop_prepared_statements)
+
+
+
+async def create_pool() -> asyncpg.Pool:
+    """
+    Creates the shared connection pool, called once when the API starts.
+
+    Returns:
+        asyncpg.Pool: The pool every query borrows its connection from.
+    """
+    global pool
+    pool = await asyncpg.create_pool(user=postgres_user,
+                                     password=postgres_password,
+                                     database=postgres_db,
+                                     host=postgres_host,
+                                     port=postgres_port,
+                                     min_size=postgres_pool_min_size,
+                                     max_size=postgres_pool_max_size,
+                                     max_inactive_connection_lifetime=postgres_pool_max_inactive_lifetime,
+                                     init=init_connection)
+    return pool
+
+
+
+async def close_pool() -> None:
+    """
+    Drains and closes the shared connection pool, called once when the API stops.
+    """
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+    prepared_statements.clear()
+
+
+
+@asynccontextmanager
+async def acquire_connection():
+    """
+    Borrows a connection from the shared pool and gives it back once the block exits.
+
+    Yields:
+        asyncpg.connection: A pooled connection to the database.
+
+    Raises:
+        RuntimeError: If the pool has not been created yet.
+    """
+    if pool is None:
+        raise RuntimeError("The database pool is not initialized.")
+
+    pool_usage['waiters'] += 1
+    try:
+        connection = await pool.acquire(timeout=postgres_pool_acquire_timeout)
+    except asyncio.TimeoutError:
+        pool_usage['acquire_timeouts'] += 1
+        raise
+    finally:
+        pool_usage['waiters'] -= 1
+
+    try:
+        yield connection
+    finally:
+        await pool.release(connection)
+
+
+
+def get_pool_stats() -> dict:
+    """
+    Returns the usage of the connection pool.
+
+    Returns:
+        dict: The in use, idle & maximum connection counts, the waiting requests and the acquisitions that timed out.
+    """
+    size = pool.get_size() if pool is not None else 0
+    idle = pool.get_idle_size() if pool is not None else 0
+    return {
+        'in_use': size - idle,
+        'idle': idle,
+        'max_size': pool.get_max_size() if pool is not None else 0,
+        'waiters': pool_usage['waiters'],
+        'acquire_timeouts': pool_usage['acquire_timeouts']
+    }
+
+
+
+async def load_default_budget_id() -> str:
+    """
+    Resolves the id of the default budget (created by init.sql) once, called when the API starts.
+
+    Returns:
+        str: The id of the default budget.
+
+    Raises:
+        RuntimeError: If the default budget does not exist.
+    """
+    global default_budget_id
+    async with acquire_connection() as engine:
+        results = await execute_registered_query(engine, 'get_default_budget_id', ())
+
+    if not results:
+        raise RuntimeError("The default budget is missing from the budgets table, check init.sql.")
+
+    default_budget_id = str(results[0]['id'])
+    return default_budget_id
+
+
+
+def get_default_budget_id() -> str:
+    """
+    Returns the id of the default budget, resolved at startup.
+
+    Returns:
+        str: The id of the default budget.
+    """
+    return default_budget_id
+
+
+
+def record_query_stats(request_to_do: str, elapsed: float, rows: int) -> None:
+    """
+    Records one execution of a query in the stats.
+
+    Args:
+        request_to_do (str): The name of the query.
+        elapsed (float): The execution time, in seconds.
+        rows (int): The number of rows returned or affected.
+    """
+    stats = query_stats.get(request_to_do)
+    if stats is None:
+        stats = {'calls': 0, 'total_time': 0.0, 'rows': 0, 'latencies': deque(maxlen=query_stats_samples)}
+        query_stats[request_to_do] = stats
+
+    stats['calls'] += 1
+    stats['total_time'] += elapsed
+    stats['rows'] += rows
+    stats['latencies'].append(elapsed)
+    observe_query(request_to_do, elapsed)
+
+    db_time = request_db_time.get()
+    if db_time is not None:
+        db_time[0] += elapsed
+        db_time[1] += 1
+
+
+
+def start_request_db_timer() -> list:
+    """
+    Starts accumulating the database time of the current request (every query recorded by record_query_stats).
+
+    Returns:
+        list: The [seconds, query count] of the request, updated in place (shared with the tasks of the request).
+    """
+    db_time = [0.0, 0]
+    request_db_time.set(db_time)
+    return db_time
+
+
+
+def get_query_stats() -> dict:
     """
-    Connects to the database using the provided credentials.
+    Summarizes the stats of every executed query, the most expensive first.
 
     Returns:
-        asyncpg.connection: The connection object representing the connection to the database.
+        dict: For each request_to_do, the call count, total / mean / p95 latency (ms) and total row count.
     """
-    return await asyncpg.connect(user=postgres_user,
-                                   password=postgres_password,
-                                   database=postgres_db,
-                                   host=postgres_host,
-                                   port=postgres_port)
+    summary = {}
+    for request_to_do, stats in sorted(query_stats.items(), key=lambda item: item[1]['total_time'], reverse=True):
+        latencies = sorted(stats['latencies'])
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        summary[request_to_do] = {
+            'calls': stats['calls'],
+            'total_ms': round(stats['total_time'] * 1000, 3),
+            'mean_ms': round(stats['total_time'] * 1000 / stats['calls'], 3),
+            'p95_ms': round(p95 * 1000, 3),
+            'rows': stats['rows']
+        }
+    return summary
+
+
+
+def bump_table_versions(request_to_do: str) -> None:
+    """
+    Bumps the version of the tables changed by a write, called once its transaction is over (committed or rolled back).
+
+    Args:
+        request_to_do (str): The write.
+    """
+    for table in written_tables.get(request_to_do, tuple(table_versions)):
+        table_versions[table] += 1
+
+        # New transactions can add categories & recipients
+        if table == 'transactions':
+            for dictionary in dictionary_cache:
+                dictionary_cache[dictionary] = None
+
+
+
+def get_table_version(table: str) -> int:
+    """
+    Returns the version of a table, it changes after every write of the table.
+
+    Args:
+        table (str): "accounts", "budgets" or "transactions".
+
+    Returns:
+        int: The version.
+    """
+    return table_versions[table]
+
+
+
+async def execute_registered_query(engine: asyncpg.connection, request_to_do: str, additional) -> list:
+    """
+    Executes a named statement of the registry on a pooled connection, and records its stats.
+
+    The statement is prepared on the first call on each connection, and reused afterwards.
+
+    Args:
+        engine (asyncpg.connection): A pooled connection.
+        request_to_do (str): The name of the query in the registry.
+        additional: Parameters of the query.
+
+    Returns:
+        list: The returned records (empty for statements returning no row).
+
+    Raises:
+        ValueError: If an invalid request_to_do is provided.
+    """
+    query = queries.get(request_to_do)
+    if not query:
+        raise ValueError(f"Invalid request_to_do: {request_to_do}")
+
+    statements = prepared_statements.setdefault(engine.get_server_pid(), {})
+    statement = statements.get(request_to_do)
+    if statement is None:
+        statement = await engine.prepare(query)
+        statements[request_to_do] = statement
+
+    started = time.perf_counter()
+    results = await statement.fetch(*additional)
+    elapsed = time.perf_counter() - started
+
+    # Row count: returned rows, or affected rows from the status message (e.g. "UPDATE 3")
+    rows = len(results)
+    if not rows:
+        status_count = (statement.get_statusmsg() or "").split(" ")[-1]
+        rows = int(status_count) if status_count.isdigit() else 0
+    record_query_stats(request_to_do, elapsed, rows)
+
+    return results
 
 
 
@@ -80,110 +624,458 @@ async def query_for_informations(request_to_do: str = None,
     if additional is None:
         additional = []
 
+    # Check query
+    if request_to_do not in queries:
+        raise ValueError(f"Invalid request_to_do: {request_to_do}")
 
-    queries = {
-        'get_username_informations': "SELECT * FROM users WHERE username=$1",
-        'get_existing_accounts': 'SELECT * FROM accounts',
-        'get_existing_budgets': 'SELECT * FROM budgets',
-        'get_existing_transactions': 'SELECT * FROM transactions',
-        'get_transaction_by_id': 'SELECT * FROM transactions WHERE id=$1',
-        'get_existing_categories': 'SELECT DISTINCT category FROM transactions'
-    }
+    # Borrow a pooled connection & apply query
+    try:
+        async with acquire_connection() as engine:
+            async with engine.transaction():
+                results = await execute_registered_query(engine, request_to_do, additional)
+                return [dict(record) for record in results]
 
-    # Initialize query
-    query = queries.get(request_to_do)
-    if not query:
-        raise ValueError(f"Invalid request_to_do: {request_to_do}")
+    except Exception as e:
+        print(f"Could not execute the query. Error: {e}")
+        return {}
+
+
+
+
+async def build_transaction_filters(filters: dict = None, additional: list = None, available_filters: dict = None) -> list:
+    """
+    Translates the transaction filters into SQL conditions, appending their values to the query parameters.
+
+    Args:
+        filters (dict): Filter name to value, None values are ignored.
+        additional (list): The query parameters, extended in place.
+        available_filters (dict): Filter name to SQL condition, transaction_filters by default.
+
+    Returns:
+        list: The SQL conditions to join with AND.
+
+    Raises:
+        ValueError: If an invalid filter is provided.
+    """
+    available_filters = available_filters or transaction_filters
+    conditions = []
+    for filter_name, filter_value in (filters or {}).items():
+        if filter_value is None:
+            continue
+        condition = available_filters.get(filter_name)
+        if not condition:
+            raise ValueError(f"Invalid transaction filter: {filter_name}")
+
+        additional.append(filter_value)
+        conditions.append(condition.format(f"${len(additional)}"))
+
+    return conditions
+
+
+
+async def build_transactions_query(filters: dict = None, cursor: tuple = None, limit: int = None) -> tuple:
+    """
+    Builds the query loading the transactions matching the filters, newest first.
+
+    Args:
+        filters (dict): Filter name to value, see transaction_filters.
+        cursor (tuple): (date, id) of the last transaction of the previous page, None for the first page.
+        limit (int): Maximum number of transactions to return, None to return every match.
+
+    Returns:
+        tuple: The query and its parameters.
+    """
+    additional = []
+    conditions = await build_transaction_filters(filters, additional)
+
+    if cursor is not None:
+        additional.extend(cursor)
+        conditions.append(f"(date, id) < (${len(additional) - 1}, ${len(additional)})")
+
+    query = "SELECT * FROM transactions"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY date DESC, id DESC"
+    if limit is not None:
+        additional.append(limit)
+        query += f" LIMIT ${len(additional)}"
 
-    # Get engine
-    engine = await connect_to_db()
+    return query, additional
+
+
+
+async def query_transactions_page(filters: dict = None, cursor: tuple = None, limit: int = None) -> list:
+    """
+    Loads the transactions matching the filters, newest first, one keyset page at a time.
+
+    Args:
+        filters (dict): Filter name to value, see transaction_filters.
+        cursor (tuple): (date, id) of the last transaction of the previous page, None for the first page.
+        limit (int): Maximum number of transactions to return, None to return every match.
+
+    Returns:
+        list: The transactions, as dictionaries, ordered by date then id, descending.
+    """
+    query, additional = await build_transactions_query(filters, cursor, limit)
 
-    # Try connection & apply query
     try:
+        async with acquire_connection() as engine:
+            started = time.perf_counter()
+            results = await engine.fetch(query, *additional)
+            record_query_stats('get_transactions_page', time.perf_counter() - started, len(results))
+            return [dict(record) for record in results]
+    except Exception as e:
+        print(f"Could not execute the query. Error: {e}")
+        raise
+
+
+
+async def stream_transactions(filters: dict = None, prefetch: int = 500):
+    """
+    Streams the transactions matching the filters from a server-side cursor, newest first.
+
+    Only `prefetch` rows are held in memory at a time, whatever the size of the table.
+
+    Args:
+        filters (dict): Filter name to value, see transaction_filters.
+        prefetch (int): Number of rows fetched from the cursor per round trip.
+
+    Yields:
+        asyncpg.Record: One transaction at a time.
+    """
+    query, additional = await build_transactions_query(filters)
+
+    async with acquire_connection() as engine:
+        # Server-side cursors only live inside a transaction
         async with engine.transaction():
+            started = time.perf_counter()
+            rows = 0
+            try:
+                async for record in engine.cursor(query, *additional, prefetch=prefetch):
+                    rows += 1
+                    yield record
+            finally:
+                record_query_stats('stream_transactions', time.perf_counter() - started, rows)
+
+
+
+
+def can_use_rollup(group_by: list, filters: dict = None) -> bool:
+    """
+    Checks if the monthly rollup can answer an aggregation, i.e. if every group & active filter has a rollup equivalent.
+
+    Args:
+        group_by (list): The groups, see analytics_groups.
+        filters (dict): Filter name to value, see transaction_filters.
+
+    Returns:
+        bool: True if the aggregation can be read from transaction_monthly_rollup.
+    """
+    active_filters = [filter_name for filter_name, filter_value in (filters or {}).items() if filter_value is not None]
+    return all(group in rollup_groups for group in group_by) and all(filter_name in rollup_filters for filter_name in active_filters)
+
+
+
+async def get_dictionary(dictionary: str, refresh: bool = False) -> dict:
+    """
+    Returns a dictionary table (id to name) from the in-process cache, loaded on first use.
+
+    Args:
+        dictionary (str): "categories" or "recipients".
+        refresh (bool): Reload the dictionary from the database.
+
+    Returns:
+        dict: Id to name.
+
+    Raises:
+        ValueError: If an invalid dictionary is provided.
+    """
+    if dictionary not in dictionary_cache:
+        raise ValueError(f"Invalid dictionary: {dictionary}")
+
+    if dictionary_cache[dictionary] is None or refresh:
+        results = await query_for_informations(request_to_do=f'get_{dictionary}', additional=None)
+        names = {row['id']: row['name'] for row in results}
+        if not names: # Empty table or failed query, loaded again next time
+            return names
+        dictionary_cache[dictionary] = names
+
+    return dictionary_cache[dictionary]
+
+
+
+async def get_dictionary_names(dictionary: str) -> list:
+    """
+    Returns the names of a dictionary table (categories or recipients), sorted, from the in-process cache.
+
+    Args:
+        dictionary (str): "categories" or "recipients".
+
+    Returns:
+        list: The names.
+    """
+    return sorted((await get_dictionary(dictionary)).values())
+
+
+
+async def query_analytics(group_by: list, filters: dict = None) -> list:
+    """
+    Sums the amount of the transactions matching the filters, grouped in the database.
+
+    Reads the monthly rollup when it can answer the aggregation, the transactions otherwise.
+
+    Args:
+        group_by (list): The groups, see analytics_groups.
+        filters (dict): Filter name to value, see transaction_filters.
+
+    Returns:
+        list: One dictionary per group with its keys and summed amount, the largest amount first.
+
+    Raises:
+        ValueError: If an invalid group is provided.
+    """
+    use_rollup = can_use_rollup(group_by, filters)
+    groups = rollup_groups if use_rollup else analytics_groups
+    table = "transaction_monthly_rollup" if use_rollup else "transactions"
+
+    columns = []
+    for group in group_by:
+        expression = groups.get(group)
+        if not expression:
+            raise ValueError(f"Invalid analytics group: {group}")
+        columns.append(f"{expression} AS {group}")
+
+    additional = []
+    conditions = await build_transaction_filters(filters, additional, rollup_filters if use_rollup else None)
+
+    query = f"SELECT {', '.join(columns)}, SUM(amount) AS amount FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" GROUP BY {', '.join(str(position) for position in range(1, len(columns) + 1))}"
+    if use_rollup:
+        # Skip the groups emptied by deletes
+        query += " HAVING SUM(transaction_count) > 0"
+    query += " ORDER BY amount DESC"
+
+    try:
+        async with acquire_connection() as engine:
+            started = time.perf_counter()
+            results = await engine.fetch(query, *additional)
+            record_query_stats(f"analytics_{'_'.join(group_by)}{'_rollup' if use_rollup else ''}", time.perf_counter() - started, len(results))
+            rows = [dict(record) for record in results]
+    except Exception as e:
+        print(f"Could not execute the query. Error: {e}")
+        raise
+
+    # Set the category & recipient names back on the dictionary ids (reloaded once for ids added since the last load)
+    if not use_rollup:
+        for group in group_by:
+            dictionary = dictionary_groups.get(group)
+            if dictionary is None:
+                continue
+            names = await get_dictionary(dictionary)
+            if any(row[group] is not None and row[group] not in names for row in rows):
+                names = await get_dictionary(dictionary, refresh=True)
+            for row in rows:
+                row[group] = names.get(row[group])
+
+    return rows
+
+
+
+async def query_time_series(filters: dict = None) -> list:
+    """
+    Sums the amount of the transactions matching the filters per month, with the cumulative sum over time.
+
+    Reads the monthly rollup when it can answer the filters, the transactions otherwise.
+
+    Args:
+        filters (dict): Filter name to value, see transaction_filters.
+
+    Returns:
+        list: One dictionary per month (year_month as "YYYY-MM", amount, cumsum), oldest first.
+    """
+    use_rollup = can_use_rollup([], filters)
+
+    additional = []
+    conditions = await build_transaction_filters(filters, additional, rollup_filters if use_rollup else None)
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    monthly = f"SELECT month, SUM(amount) AS amount FROM transaction_monthly_rollup{where} GROUP BY 1 HAVING SUM(transaction_count) > 0" if use_rollup \
+        else f"SELECT date_trunc('month', date) AS month, SUM(amount) AS amount FROM transactions{where} GROUP BY 1"
+
+    query = f"""
+        SELECT to_char(month, 'YYYY-MM') AS year_month, amount, SUM(amount) OVER (ORDER BY month) AS cumsum
+        FROM ({monthly}) monthly
+        ORDER BY month
+    """
+
+    try:
+        async with acquire_connection() as engine:
+            started = time.perf_counter()
             results = await engine.fetch(query, *additional)
+            record_query_stats(f"analytics_time_series{'_rollup' if use_rollup else ''}", time.perf_counter() - started, len(results))
             return [dict(record) for record in results]
-        
     except Exception as e:
         print(f"Could not execute the query. Error: {e}")
-        return {}
-    
-    finally:
-        await engine.close()
+        raise
+
+
 
 
+async def query_insert_values(request_to_do: str = None, additional=None) -> list:
+    """
+    Executes a write in its own transaction.
+
+    Args:
+        request_to_do (str): The write to execute.
+        additional: Additional parameters to be used in the query.
 
+    Returns:
+        list: The rows returned by the write (RETURNING), empty when an INSERT ... ON CONFLICT DO NOTHING skipped the row,
+        None if the write failed.
 
-async def query_insert_values(request_to_do: str = None, additional=None) -> None:
+    Raises:
+        ValueError: If an invalid request_to_do is provided.
+    """
     additional = await transform_additional(additional)
     if additional is None:
         additional = []
 
-    queries = {
-        'create_new_account': 'INSERT INTO accounts (id, name, type, balance, owner) VALUES ($1, $2, $3, $4, $5)',
-        'delete_account': 'DELETE FROM accounts WHERE id=$1',
-        'create_new_budget': 'INSERT INTO budgets (id, name, month, amount) VALUES ($1, $2, $3, $4)',
-        'delete_budget': 'DELETE FROM budgets WHERE id=$1',
-        'create_new_transaction': 'INSERT INTO transactions (id, date, type, amount, origin_account, destination_account, budget, category, recipient, description) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)',
-        'delete_transaction': 'DELETE FROM transactions WHERE id=$1',
-        'apply_transaction_to_budget': 'UPDATE budgets SET amount = amount - $1 WHERE id = $2',
-        'apply_transaction_to_accounts': """
-            UPDATE accounts
-            SET balance = CASE 
-                WHEN name = $1 THEN balance - $2
-                WHEN name = $3 THEN balance + $4
-                ELSE balance
-            END
-            WHERE name IN ($1, $3)
-        """
-    }
+    if request_to_do not in queries:
+        raise ValueError(f"Invalid request_to_do: {request_to_do}")
 
-    query = queries.get(request_to_do)
-    if not query:
+    try:
+        async with acquire_connection() as engine:
+            async with engine.transaction():
+                return await execute_registered_query(engine, request_to_do, additional)
+    except Exception as e:
+        print(f"Could not execute the query. Error: {e}")
+        return None
+    finally:
+        bump_table_versions(request_to_do)
+
+
+
+async def query_unit_of_work(request_to_do: str = None, additional=None) -> dict:
+    """
+    Executes a multi-table write as a single statement, on one connection and in one transaction.
+
+    The transaction row, the account balances and the budget amount are changed together,
+    so a failure can never leave the balances half-applied.
+
+    Args:
+        request_to_do (str): The unit of work to execute.
+        additional: Additional parameters to be used in the query.
+
+    Returns:
+        dict: The summary row returned by the statement.
+
+    Raises:
+        ValueError: If an invalid request_to_do is provided.
+        Exception: Any database error, after the transaction has been rolled back.
+    """
+    additional = await transform_additional(additional)
+    if additional is None:
+        additional = []
+
+    if request_to_do not in queries:
         raise ValueError(f"Invalid request_to_do: {request_to_do}")
 
-    if request_to_do == 'apply_transaction_to_accounts':
-        additional_list = list(additional)
-        type = additional[0]
-        additional_list.pop(0)
+    try:
+        async with acquire_connection() as engine:
+            async with engine.transaction():
+                results = await execute_registered_query(engine, request_to_do, additional)
+                return dict(results[0])
+    except Exception as e:
+        print(f"Could not execute the unit of work. Error: {e}")
+        raise
+    finally:
+        bump_table_versions(request_to_do)
 
-        if type == 'credit':
-            additional_list.pop(1)
-            additional = tuple(additional_list)
-            query = """
-            UPDATE accounts
-            SET balance = balance + $1
-            WHERE name = $2
-            """
-
-        if type == 'debit':
-            additional_list.pop(2)
-            additional = tuple(additional_list)
-            query = """
-            UPDATE accounts
-            SET balance = balance - $1
-            WHERE name = $2
-            """
-
-        if type == 'transfer':
-            transaction_amount, origin_account, destination_account = additional_list
-            additional = (origin_account, destination_account, transaction_amount)
-            query = """
-            UPDATE accounts
-            SET balance = CASE 
-                WHEN name = $1 THEN balance - $3
-                WHEN name = $2 THEN balance + $3
-                ELSE balance
-            END
-            WHERE name IN ($1, $2)
-            """ 
 
-    engine = await connect_to_db()
+
+async def query_bulk_import_transactions(records: list, account_deltas: dict, budget_deltas: dict) -> int:
+    """
+    Loads validated transactions with COPY and applies their net effect on accounts and budgets, in one transaction.
+
+    Each table gets a single aggregated UPDATE, whatever the number of imported rows.
+
+    Args:
+        records (list): Transaction tuples, in the order of the `transactions` columns below.
+        account_deltas (dict): Account id to net balance change.
+        budget_deltas (dict): Budget id to net amount change.
+
+    Returns:
+        int: The number of imported transactions.
+
+    Raises:
+        Exception: Any database error, after the transaction has been rolled back.
+    """
+    columns = ['id', 'date', 'type', 'amount', 'origin_account', 'destination_account', 'budget', 'category', 'recipient', 'description',
+               'origin_account_id', 'destination_account_id']
 
     try:
-        async with engine.transaction():
-            await engine.execute(query, *additional)
+        async with acquire_connection() as engine:
+            async with engine.transaction():
+                started = time.perf_counter()
+                await engine.copy_records_to_table('transactions', records=records, columns=columns)
+                record_query_stats('bulk_import_transactions', time.perf_counter() - started, len(records))
+
+                if account_deltas:
+                    await execute_registered_query(engine, 'apply_account_deltas', (list(account_deltas.keys()), list(account_deltas.values())))
+
+                if budget_deltas:
+                    await execute_registered_query(engine, 'apply_budget_deltas', (list(budget_deltas.keys()), list(budget_deltas.values())))
+
+                await execute_registered_query(engine, 'apply_transactions_to_rollup', ([record[0] for record in records], default_budget_id))
+
+        return len(records)
     except Exception as e:
-        print(f"Could not execute the query. Error: {e}")
+        print(f"Could not import the transactions. Error: {e}")
+        raise
+    finally:
+        bump_table_versions('bulk_import_transactions')
+
+
+
+async def query_bulk_delete_transactions(transaction_ids: list = None, filters: dict = None) -> dict:
+    """
+    Deletes the transactions matching the ids and / or the filters, and reverses them on accounts, budgets and the monthly rollup,
+    in one statement and one transaction.
+
+    Args:
+        transaction_ids (list, optional): The ids of the transactions to delete.
+        filters (dict, optional): Filter name to value, see transaction_filters.
+
+    Returns:
+        dict: The number of deleted transactions, updated accounts and updated budgets.
+
+    Raises:
+        ValueError: If neither ids nor filters are provided (the whole table would be deleted), or if a filter is invalid.
+        Exception: Any database error, after the transaction has been rolled back.
+    """
+    additional = [default_budget_id]
+    conditions = []
+    if transaction_ids is not None:
+        additional.append(transaction_ids)
+        conditions.append(f"id = ANY(${len(additional)}::uuid[])")
+    conditions += await build_transaction_filters(filters, additional)
+
+    if not conditions:
+        raise ValueError("Transaction ids or filters are required to delete transactions.")
+
+    query = bulk_delete_transactions_query.format(conditions=" AND ".join(conditions))
+
+    try:
+        async with acquire_connection() as engine:
+            async with engine.transaction():
+                started = time.perf_counter()
+                results = await engine.fetch(query, *additional)
+                summary = dict(results[0])
+                record_query_stats('bulk_delete_transactions', time.perf_counter() - started, summary['transactions'])
+        return summary
+    except Exception as e:
+        print(f"Could not delete the transactions. Error: {e}")
+        raise
     finally:
-        await engine.close()
\ No newline at end of file
+        bump_table_versions('bulk_delete_transactions')
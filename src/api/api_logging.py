@@ -0,0 +1,178 @@
+"""
+API - LOGGING
+"""
+
+"""
+LIB
+"""
+from datetime import datetime, timezone
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import random
+import time
+import urllib.parse
+
+
+"""
+VARS
+"""
+from api_vars import log_file, log_queue_size, log_sample_rate, log_body_max_bytes
+
+# Request logs are queued by the event loop and written by the listener thread
+log_queue = queue.Queue(maxsize=log_queue_size)
+log_listener = None
+dropped_logs = {'count': 0}
+
+# Only the login form carries a password
+sanitized_paths = ("/login",)
+masked_fields = ("password",)
+
+
+"""
+LOGGER
+"""
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON line, with the fields passed in `extra={"fields": {...}}`.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        line.update(getattr(record, 'fields', {}))
+        return json.dumps(line, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Queue handler that drops (and counts) records when the queue is full, instead of blocking the event loop.
+    """
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_logs['count'] += 1
+
+
+logger = logging.getLogger("api_logger")
+logger.setLevel(logging.INFO)
+logger.propagate = False # Written by the listener only, never on the event loop
+logger.addHandler(DroppingQueueHandler(log_queue))
+
+
+def start_logging() -> None:
+    """
+    Starts the background thread writing the queued records to the log file and the console.
+    """
+    global log_listener
+
+    json_formatter = JsonFormatter()
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(json_formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(json_formatter)
+
+    log_listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    log_listener.start()
+
+
+def stop_logging() -> None:
+    """
+    Writes the remaining queued records and stops the background thread.
+    """
+    global log_listener
+
+    if log_listener is not None:
+        log_listener.stop()
+        for handler in log_listener.handlers:
+            handler.close()
+        log_listener = None
+
+
+"""
+MIDDLEWARE
+"""
+def sanitize_body(path: str, content_type: str, body: bytes) -> str:
+    """
+    Returns the body to log, with the password masked in form-encoded login bodies. Other bodies are not parsed.
+
+    Args:
+        path (str): The request path.
+        content_type (str): The request content type.
+        body (bytes): The captured body (at most `log_body_max_bytes`).
+
+    Returns:
+        str: The body to log.
+    """
+    body_str = body.decode("utf-8", errors="replace")
+
+    if path.endswith(sanitized_paths) and content_type.startswith("application/x-www-form-urlencoded"):
+        parsed_body = urllib.parse.parse_qs(body_str)
+        for field in masked_fields:
+            if field in parsed_body:
+                parsed_body[field] = ["masked_from_logs"]
+        body_str = urllib.parse.urlencode(parsed_body, doseq=True)
+
+    return body_str
+
+
+class RequestLoggingMiddleware:
+    """
+    ASGI middleware logging each request as a JSON line: method, path, client, status, duration and the start of the body.
+
+    The body is captured while the application reads it (never buffered ahead), up to `log_body_max_bytes`.
+    Successful requests are logged at `log_sample_rate`, errors (status >= 400) always.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        captured_body = bytearray()
+        request_size = 0
+        status_code = 500
+
+        async def logged_receive():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                request_size += len(chunk)
+                if len(captured_body) < log_body_max_bytes:
+                    captured_body.extend(chunk[:log_body_max_bytes - len(captured_body)])
+            return message
+
+        async def logged_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, logged_receive, logged_send)
+        finally:
+            if status_code >= 400 or random.random() < log_sample_rate:
+                headers = dict(scope.get("headers") or [])
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                client = scope.get("client")
+
+                logger.info("request", extra={'fields': {
+                    'method': scope["method"],
+                    'path': scope["path"],
+                    'query': scope.get("query_string", b"").decode("latin-1"),
+                    'client_ip': client[0] if client else None,
+                    'status': status_code,
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                    'request_size': request_size,
+                    'body': sanitize_body(scope["path"], content_type, bytes(captured_body)),
+                    'body_truncated': request_size > len(captured_body)
+                }})
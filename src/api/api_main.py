@@ -5,13 +5,14 @@ API - MAIN
 """
 LIB
 """
+from contextlib import asynccontextmanager
+import time
 from fastapi import FastAPI, Request
-import logging
+from fastapi.middleware.gzip import GZipMiddleware
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from starlette.responses import JSONResponse, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse, PlainTextResponse
 
 
 """
@@ -24,7 +25,26 @@ VARS
 API declaration
 """
 
-from api_vars import api_version, current_state
+from api_vars import api_version, current_state, gzip_minimum_size, gzip_compress_level
+from api_db_connectors import create_pool, close_pool, load_default_budget_id, start_request_db_timer, get_pool_stats
+from api_metrics import observe_request, count_rate_limit_rejection, render_prometheus
+from api_responses import default_response_class
+from api_logging import start_logging, stop_logging, RequestLoggingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the log writer, opens the database connection pool & resolves the default budget on startup,
+    drains the pool & flushes the logs on shutdown.
+    """
+    start_logging()
+    await create_pool()
+    await load_default_budget_id()
+    yield
+    await close_pool()
+    stop_logging()
+
 
 app = FastAPI(
     title="Personal bank app",
@@ -50,9 +70,19 @@ app = FastAPI(
         {
             'name': 'transaction',
             'description': 'Transaction'
-        }   
+        },
+        {
+            'name': 'analytics',
+            'description': 'Analytics'
+        },
+        {
+            'name': 'admin',
+            'description': 'Admin'
+        }
     ],
-    debug=True # DEBUG MODE
+    debug=True, # DEBUG MODE
+    lifespan=lifespan,
+    default_response_class=default_response_class # orjson when installed, see api_responses
 )
 
 
@@ -61,14 +91,36 @@ limiter = Limiter(key_func=get_remote_address)
 
 # Limiter Middleware
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, lambda request, exc: JSONResponse(
-    status_code=429,
-    content={"detail": "Rate limit exceeded"}
-))
+def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> JSONResponse:
+    """
+    Rejects a request over the rate limit, and counts the rejection (see /metrics).
+    """
+    route = request.scope.get("route")
+    count_rate_limit_rejection(request.method, route.path if route else request.url.path)
+    return JSONResponse(status_code=429, content={"detail": "Rate limit exceeded"})
+
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
+    """
+    Measures the request (total, database & handler time), records it in the route histograms (see api_metrics)
+    and returns it in the X-Process-Time (seconds) and Server-Timing (ms) headers.
+    """
+    started = time.perf_counter()
+    db_time = start_request_db_timer()
+
     response = await call_next(request)
+
+    elapsed = time.perf_counter() - started
+    db_elapsed, db_queries = db_time
+    route = request.scope.get("route")
+    observe_request(request.method, route.path if route else "unmatched", response.status_code, elapsed, db_elapsed)
+
+    response.headers["X-Process-Time"] = f"{elapsed:.6f}"
+    response.headers["Server-Timing"] = (f'db;dur={db_elapsed * 1000:.3f};desc="{db_queries} queries", '
+                                         f'app;dur={(elapsed - db_elapsed) * 1000:.3f}, '
+                                         f'total;dur={elapsed * 1000:.3f}')
     return response
 
 
@@ -76,61 +128,11 @@ async def add_process_time_header(request: Request, call_next):
 """
 API Logger
 """
-# Logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("api_logger")
-
-# File handler
-# Create a file handler
-file_handler = logging.FileHandler('api_logs.log')
-file_handler.setLevel(logging.INFO)
-# Create a logging format
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-
-logger.addHandler(file_handler)
-
+# Requests are logged as JSON lines through a queue (see api_logging), passwords of the login form are masked
+app.add_middleware(RequestLoggingMiddleware)
 
-# Middleware to sanitize sensitive information
-class SanitizeLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Extract client IP
-        client_ip = request.client.host
-
-        # Extract request body
-        body = await request.body()
-        body_str = body.decode("utf-8")
-
-        # Sanitize sensitive information
-        sanitized_body_str = self.sanitize_body(body_str)
-
-        # Log sanitized request details
-        logger.info(f"Request: {request.method} {request.url} from {client_ip} with body: {sanitized_body_str}")
-
-        # Process request
-        response = await call_next(request)
-
-        # Log response status
-        logger.info(f"Response status: {response.status_code}\n")
-        return response
-
-    def sanitize_body(self, body_str: str) -> str:
-        import urllib.parse
-
-        # Parse the body string into a dictionary
-        parsed_body = urllib.parse.parse_qs(body_str)
-
-        # Replace the value of the "password" key with asterisks
-        if "password" in parsed_body:
-            parsed_body["password"] = ["masked_from_logs"]
-
-        # Recompose the body string
-        sanitized_body_str = urllib.parse.urlencode(parsed_body, doseq=True)
-        return sanitized_body_str
-
-
-# Add middleware to the FastAPI application
-app.add_middleware(SanitizeLoggingMiddleware)
+# Compression of the responses above the minimum size (tables), smaller ones are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=gzip_minimum_size, compresslevel=gzip_compress_level)
 
 
 ######################################################################################
@@ -152,6 +154,19 @@ async def get_status() -> dict:
     """
     return {"status": "Working", "version": api_version, "current_state": current_state}
 
+
+# metrics route
+@app.get("/metrics", name="metrics", tags=['admin'], response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Expose the API metrics in the Prometheus text format, to be scraped.
+
+    Returns:
+        PlainTextResponse: Request counts & latency histograms by route, database pool usage (in use, idle, waiters),
+        query latency by request_to_do, rate limit rejections and password hashing durations.
+    """
+    return PlainTextResponse(render_prometheus(get_pool_stats()), media_type="text/plain; version=0.0.4")
+
 """
 ROUTERS
 """
@@ -165,4 +180,10 @@ from api_budget_router import budget_router
 app.include_router(budget_router, tags=["budget"])
 
 from api_transaction_router import transaction_router
-app.include_router(transaction_router, tags=["transaction"])
\ No newline at end of file
+app.include_router(transaction_router, tags=["transaction"])
+
+from api_analytics_router import analytics_router
+app.include_router(analytics_router, tags=["analytics"])
+
+from api_metrics_router import metrics_router
+app.include_router(metrics_router, tags=["admin"])
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""
+API - METRICS
+"""
+
+"""
+LIB
+"""
+from bisect import bisect_left
+
+
+"""
+VARS
+"""
+# Upper bounds of the latency buckets, in seconds
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Requests by (method, route, status), latency of the requests & of their database queries by (method, route)
+route_requests = {}
+route_latency = {}
+route_db_latency = {}
+
+# Database query latency, by request_to_do
+query_latency = {}
+
+# Password hashing latency, by pwd_context function (verify_and_update, hash...)
+password_hashing_latency = {}
+
+# Requests rejected by the rate limiter, by (method, route)
+rate_limit_rejections = {}
+
+
+"""
+HISTOGRAMS
+"""
+class Histogram:
+    """
+    Latency histogram with fixed buckets, a count and a sum (cumulative like Prometheus histograms when read).
+    """
+    def __init__(self, buckets: tuple = latency_buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+
+    def cumulative_counts(self) -> list:
+        """
+        Returns the (upper bound, observations <= upper bound) pairs, "+Inf" last.
+        """
+        counts = []
+        total = 0
+        for upper_bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            total += bucket_count
+            counts.append((upper_bound, total))
+        counts.append(("+Inf", self.count))
+        return counts
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total_ms': round(self.sum * 1000, 3),
+            'mean_ms': round(self.sum * 1000 / self.count, 3) if self.count else 0.0,
+            'buckets': {f"le_{upper_bound}": count for upper_bound, count in self.cumulative_counts()}
+        }
+
+
+
+def observe_request(method: str, route: str, status: int, elapsed: float, db_elapsed: float) -> None:
+    """
+    Records a request, its latency and the time it spent in the database.
+
+    Args:
+        method (str): The HTTP method.
+        route (str): The route path template (e.g. "/api/0.2.1/table/transaction"), not the requested URL.
+        status (int): The response status code.
+        elapsed (float): The request latency, in seconds.
+        db_elapsed (float): The database time of the request, in seconds.
+    """
+    request_key = (method, route, status)
+    route_requests[request_key] = route_requests.get(request_key, 0) + 1
+
+    key = (method, route)
+    if key not in route_latency:
+        route_latency[key] = Histogram()
+        route_db_latency[key] = Histogram()
+
+    route_latency[key].observe(elapsed)
+    route_db_latency[key].observe(db_elapsed)
+
+
+
+def observe_query(request_to_do: str, elapsed: float) -> None:
+    """
+    Records the latency of a database query.
+
+    Args:
+        request_to_do (str): The name of the query.
+        elapsed (float): The execution time, in seconds.
+    """
+    if request_to_do not in query_latency:
+        query_latency[request_to_do] = Histogram()
+    query_latency[request_to_do].observe(elapsed)
+
+
+
+def observe_password_hashing(function_name: str, elapsed: float) -> None:
+    """
+    Records the duration of a password hashing call.
+
+    Args:
+        function_name (str): The pwd_context function (verify_and_update, hash...).
+        elapsed (float): The hashing time, in seconds.
+    """
+    if function_name not in password_hashing_latency:
+        password_hashing_latency[function_name] = Histogram(buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+    password_hashing_latency[function_name].observe(elapsed)
+
+
+
+def count_rate_limit_rejection(method: str, route: str) -> None:
+    """
+    Counts a request rejected by the rate limiter.
+
+    Args:
+        method (str): The HTTP method.
+        route (str): The route path template.
+    """
+    key = (method, route)
+    rate_limit_rejections[key] = rate_limit_rejections.get(key, 0) + 1
+
+
+
+def get_route_latency_stats() -> dict:
+    """
+    Summarizes the latency histograms of every route, the most expensive first.
+
+    Returns:
+        dict: For each "<method> <route>", the request and database latency histograms.
+    """
+    summary = {}
+    for (method, route), histogram in sorted(route_latency.items(), key=lambda item: item[1].sum, reverse=True):
+        summary[f"{method} {route}"] = {
+            'latency': histogram.to_dict(),
+            'db_latency': route_db_latency[(method, route)].to_dict()
+        }
+    return summary
+
+
+
+"""
+PROMETHEUS
+"""
+def format_labels(labels: dict) -> str:
+    """
+    Formats Prometheus labels, escaping backslashes, quotes and new lines of the values.
+    """
+    if not labels:
+        return ""
+
+    formatted = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        formatted.append(f'{name}="{value}"')
+    return "{" + ",".join(formatted) + "}"
+
+
+
+def format_histogram(name: str, labels: dict, histogram: Histogram) -> list:
+    """
+    Formats a histogram as Prometheus _bucket, _sum and _count samples.
+    """
+    lines = [f"{name}_bucket{format_labels({**labels, 'le': upper_bound})} {count}" for upper_bound, count in histogram.cumulative_counts()]
+    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+    return lines
+
+
+
+def render_prometheus(pool_stats: dict) -> str:
+    """
+    Renders every metric in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        pool_stats (dict): The database pool usage (see get_pool_stats of api_db_connectors).
+
+    Returns:
+        str: The metrics, one sample per line.
+    """
+    lines = ["# HELP bank_api_requests_total Requests handled, by route and status.",
+             "# TYPE bank_api_requests_total counter"]
+    for (method, route, status), count in sorted(route_requests.items()):
+        lines.append(f"bank_api_requests_total{format_labels({'method': method, 'route': route, 'status': status})} {count}")
+
+    lines += ["# HELP bank_api_request_duration_seconds Request latency, by route.",
+              "# TYPE bank_api_request_duration_seconds histogram"]
+    for (method, route), histogram in sorted(route_latency.items()):
+        lines += format_histogram("bank_api_request_duration_seconds", {'method': method, 'route': route}, histogram)
+
+    lines += ["# HELP bank_api_request_db_duration_seconds Database time of the requests, by route.",
+              "# TYPE bank_api_request_db_duration_seconds histogram"]
+    for (method, route), histogram in sorted(route_db_latency.items()):
+        lines += format_histogram("bank_api_request_db_duration_seconds", {'method': method, 'route': route}, histogram)
+
+    lines += ["# HELP bank_api_db_query_duration_seconds Database query latency, by request_to_do.",
+              "# TYPE bank_api_db_query_duration_seconds histogram"]
+    for request_to_do, histogram in sorted(query_latency.items()):
+        lines += format_histogram("bank_api_db_query_duration_seconds", {'query': request_to_do}, histogram)
+
+    lines += ["# HELP bank_api_db_pool_connections Pooled database connections, by state.",
+              "# TYPE bank_api_db_pool_connections gauge",
+              f"bank_api_db_pool_connections{format_labels({'state': 'in_use'})} {pool_stats['in_use']}",
+              f"bank_api_db_pool_connections{format_labels({'state': 'idle'})} {pool_stats['idle']}",
+              "# HELP bank_api_db_pool_max_connections Maximum size of the database pool.",
+              "# TYPE bank_api_db_pool_max_connections gauge",
+              f"bank_api_db_pool_max_connections {pool_stats['max_size']}",
+              "# HELP bank_api_db_pool_waiters Requests waiting for a pooled connection.",
+              "# TYPE bank_api_db_pool_waiters gauge",
+              f"bank_api_db_pool_waiters {pool_stats['waiters']}",
+              "# HELP bank_api_db_pool_acquire_timeouts_total Requests that could not get a pooled connection in time.",
+              "# TYPE bank_api_db_pool_acquire_timeouts_total counter",
+              f"bank_api_db_pool_acquire_timeouts_total {pool_stats['acquire_timeouts']}"]
+
+    lines += ["# HELP bank_api_rate_limit_rejections_total Requests rejected by the rate limiter, by route.",
+              "# TYPE bank_api_rate_limit_rejections_total counter"]
+    for (method, route), count in sorted(rate_limit_rejections.items()):
+        lines.append(f"bank_api_rate_limit_rejections_total{format_labels({'method': method, 'route': route})} {count}")
+
+    lines += ["# HELP bank_api_password_hashing_duration_seconds Password hashing time, by function.",
+              "# TYPE bank_api_password_hashing_duration_seconds histogram"]
+    for function_name, histogram in sorted(password_hashing_latency.items()):
+        lines += format_histogram("bank_api_password_hashing_duration_seconds", {'function': function_name}, histogram)
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+"""
+API - METRICS ROUTER
+"""
+
+"""
+LIB
+"""
+from fastapi import APIRouter, Depends
+
+from api_db_connectors import get_query_stats
+from api_metrics import get_route_latency_stats
+
+
+"""
+VARS
+"""
+from api_vars import api_version
+from api_auth_router import get_current_user, get_token_cache_stats
+
+metrics_router = APIRouter()
+
+
+"""
+METRICS ROUTES
+"""
+# Query stats
+@metrics_router.get(f"/api/{api_version}/metrics/queries", name="get_query_metrics", tags=['admin'])
+async def app_get_query_metrics(current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Retrieve the stats of every database query executed since the API started, the most expensive first.
+
+    Parameters:
+    - current_user (str): The username of the current user.
+
+    Returns:
+    - dict: For each query, the call count, total / mean / p95 latency (ms) and total row count.
+
+    """
+    return {'query stats': get_query_stats()}
+
+
+# Token cache stats
+@metrics_router.get(f"/api/{api_version}/metrics/tokens", name="get_token_metrics", tags=['admin'])
+async def app_get_token_metrics(current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Retrieve the counters of the verified token cache since the API started.
+
+    Parameters:
+    - current_user (str): The username of the current user.
+
+    Returns:
+    - dict: The hits, misses, hit ratio, cached and revoked token counts.
+
+    """
+    return {'token cache stats': get_token_cache_stats()}
+
+
+# Route latency histograms
+@metrics_router.get(f"/api/{api_version}/metrics/routes", name="get_route_metrics", tags=['admin'])
+async def app_get_route_metrics(current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Retrieve the latency histograms of every route since the API started, the most expensive first.
+
+    Parameters:
+    - current_user (str): The username of the current user.
+
+    Returns:
+    - dict: For each route, the request and database latency histograms (count, total / mean latency (ms), cumulative buckets).
+
+    """
+    return {'route stats': get_route_latency_stats()}
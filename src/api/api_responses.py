@@ -0,0 +1,203 @@
+"""
+API - RESPONSES
+"""
+
+"""
+LIB
+"""
+from decimal import Decimal
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+import hashlib
+import pyarrow as pa
+import pyarrow.parquet as pq
+from starlette.responses import JSONResponse, Response
+import uuid
+
+try:
+    import orjson
+except ImportError: # Optional, the standard JSON path (jsonable_encoder + json.dumps) is used without it
+    orjson = None
+
+
+"""
+VARS
+"""
+# Columnar formats, chosen by the Accept header of the request
+arrow_media_type = "application/vnd.apache.arrow.stream"
+parquet_media_type = "application/vnd.apache.parquet"
+
+# Changes on every start, so ETags of a previous run (table versions restart at 0) never match
+boot_id = uuid.uuid4().hex[:12]
+
+# Typed columns, the type of every other column is inferred (UUIDs are sent as strings)
+arrow_column_types = {
+    'balance': pa.float64(),
+    'amount': pa.float64(),
+    'date': pa.timestamp('us'),
+    'created_at': pa.timestamp('us'),
+    'category_id': pa.int32(),
+    'recipient_id': pa.int32()
+}
+
+
+"""
+JSON
+"""
+def orjson_default(value):
+    """
+    Serializes the values orjson does not support natively (UUIDs, datetimes and floats are native).
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson. Returned directly by a route, it also skips FastAPI's jsonable_encoder.
+    """
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+# Default response class of the app, orjson when installed
+default_response_class = FastJSONResponse if orjson is not None else JSONResponse
+
+
+def json_response(content: dict, headers: dict = None):
+    """
+    Returns the content as a FastJSONResponse when orjson is installed, so it is serialized in one pass
+    (rows, UUIDs and datetimes included), or through the standard FastAPI path.
+
+    Args:
+        content (dict): The JSON content.
+        headers (dict, optional): Response headers (e.g. ETag).
+
+    Returns:
+        FastJSONResponse, JSONResponse or dict: The response, or the content to be encoded by FastAPI.
+    """
+    if orjson is not None:
+        return FastJSONResponse(content, headers=headers)
+    if headers:
+        return JSONResponse(jsonable_encoder(content), headers=headers)
+    return content
+
+
+
+"""
+CONDITIONAL GET
+"""
+def get_table_media_type(request: Request) -> str:
+    """
+    Returns the format asked by the Accept header: Arrow IPC stream, Parquet, or JSON by default.
+    """
+    accept = request.headers.get("accept", "")
+    if arrow_media_type in accept:
+        return arrow_media_type
+    if parquet_media_type in accept:
+        return parquet_media_type
+    return "application/json"
+
+
+def table_etag(request: Request, table_name: str, version: int) -> str:
+    """
+    Returns the strong ETag of a table response, known before reading the table.
+
+    It changes with the table version (bumped by every write), the boot of the API, the query parameters,
+    the format and the gzip encoding of the response.
+
+    Args:
+        request (Request): The request.
+        table_name (str): The name of the table.
+        version (int): The version of the table (see get_table_version of api_db_connectors).
+
+    Returns:
+        str: The quoted ETag.
+    """
+    params = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    gzip = "gzip" in request.headers.get("accept-encoding", "")
+    params_hash = hashlib.sha256(f"{params}|{get_table_media_type(request)}|{gzip}".encode()).hexdigest()[:16]
+    return f'"{boot_id}-{table_name}-{version}-{params_hash}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Returns True if the If-None-Match header of the request matches the ETag (the client copy is up to date).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    client_etags = [client_etag.strip().removeprefix("W/") for client_etag in if_none_match.split(",")]
+    return "*" in client_etags or etag in client_etags
+
+
+def not_modified_response(etag: str) -> Response:
+    """
+    Returns an empty 304 Not Modified response.
+    """
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+
+"""
+FUNCTIONS
+"""
+def rows_to_arrow(rows: list) -> pa.Table:
+    """
+    Converts table rows into a typed Arrow table.
+
+    Args:
+        rows (list): The rows, as dictionaries sharing the same keys.
+
+    Returns:
+        pa.Table: One typed column per key (float64 money, timestamp dates, int32 dictionary ids, strings for UUIDs, inferred otherwise).
+    """
+    columns = list(rows[0].keys()) if rows else []
+    arrays = {}
+    for column in columns:
+        values = [row[column] for row in rows]
+        column_type = arrow_column_types.get(column)
+        if column_type is None:
+            values = [str(value) if isinstance(value, uuid.UUID) else value for value in values]
+        arrays[column] = pa.array(values, type=column_type)
+
+    return pa.table(arrays)
+
+
+
+def table_response(request: Request, table_name: str, rows: list, metadata: dict = None, etag: str = None):
+    """
+    Returns table rows in the format asked by the Accept header: Arrow IPC stream, Parquet, or JSON by default (see json_response).
+
+    Args:
+        request (Request): The request, its Accept header selects the format.
+        table_name (str): The name of the table, the JSON key is "<table_name> table".
+        rows (list): The rows, as dictionaries.
+        metadata (dict, optional): Additional values (e.g. next_cursor), JSON keys or X- headers for columnar formats.
+        etag (str, optional): The ETag of the response (see table_etag), clients revalidate it with If-None-Match.
+
+    Returns:
+        dict or Response: The JSON content (or its FastJSONResponse), or a Response holding the columnar body.
+    """
+    metadata = metadata or {}
+    media_type = get_table_media_type(request)
+    etag_headers = {"ETag": etag, "Cache-Control": "no-cache"} if etag else {}
+
+    if media_type == "application/json":
+        return json_response({f"{table_name} table": rows, **metadata}, headers=etag_headers)
+
+    arrow_table = rows_to_arrow(rows)
+    sink = pa.BufferOutputStream()
+    if media_type == arrow_media_type:
+        with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+    else:
+        pq.write_table(arrow_table, sink)
+
+    headers = {f"X-{key.replace('_', '-').title()}": str(value) for key, value in metadata.items() if value is not None}
+    headers.update(etag_headers)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=media_type, headers=headers)
@@ -5,10 +5,20 @@ API - TRANSACTION ROUTER
 """
 LIB
 """
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
-
-from api_db_connectors import query_for_informations, query_insert_values
+import asyncio
+import base64
+import csv
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import List
+from fastapi.responses import StreamingResponse
+import io
+import json
+import math
+import uuid
+
+from api_db_connectors import query_for_informations, query_unit_of_work, query_transactions_page, stream_transactions, query_bulk_import_transactions, query_bulk_delete_transactions, get_default_budget_id, get_table_version, get_dictionary_names
+from api_responses import table_response, table_etag, is_not_modified, not_modified_response
 from api_vars import generate_uuid
 
 
@@ -21,6 +31,159 @@ from api_auth_router import get_current_user
 transaction_router = APIRouter()
 
 
+"""
+PAGINATION
+"""
+def encode_cursor(transaction: dict) -> str:
+    """
+    Encodes the (date, id) keyset of a transaction into an opaque cursor.
+
+    Parameters:
+    - transaction (dict): The last transaction of a page.
+
+    Returns:
+    - str: The cursor to send back to get the next page.
+    """
+    raw_cursor = f"{transaction['date'].isoformat()}|{transaction['id']}"
+    return base64.urlsafe_b64encode(raw_cursor.encode("utf-8")).decode("utf-8")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decodes an opaque cursor into the (date, id) keyset it was built from.
+
+    Parameters:
+    - cursor (str): The cursor returned with the previous page.
+
+    Returns:
+    - tuple: The (date, id) of the last transaction of the previous page.
+
+    Raises:
+    - HTTPException: If the cursor is malformed.
+    """
+    try:
+        raw_cursor = base64.urlsafe_b64decode(cursor.encode("utf-8")).decode("utf-8")
+        cursor_date, cursor_id = raw_cursor.split("|")
+        return datetime.fromisoformat(cursor_date), uuid.UUID(cursor_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+"""
+FILTERS
+"""
+def get_transaction_filters(start_date: date = None,
+                            end_date: date = None,
+                            transaction_type: str = None,
+                            account: str = None,
+                            budget: uuid.UUID = None,
+                            category: str = None,
+                            recipient: str = None) -> dict:
+    """
+    Collects the transaction filters shared by the table and export routes.
+
+    Parameters:
+    - start_date (date, optional): Keep transactions made on or after this day.
+    - end_date (date, optional): Keep transactions made on or before this day.
+    - transaction_type (str, optional): Keep transactions of this type.
+    - account (str, optional): Keep transactions with this account as origin or destination.
+    - budget (UUID, optional): Keep transactions applied to this budget id.
+    - category (str, optional): Keep transactions of this category.
+    - recipient (str, optional): Keep transactions to this recipient.
+
+    Returns:
+    - dict: The filters, as expected by the database connectors.
+    """
+    return {
+        'start_date': datetime.combine(start_date, datetime.min.time()) if start_date else None,
+        'end_date': datetime.combine(end_date + timedelta(days=1), datetime.min.time()) if end_date else None,
+        'transaction_type': transaction_type,
+        'account': account,
+        'budget': budget,
+        'category': category,
+        'recipient': recipient
+    }
+
+
+"""
+IMPORT
+"""
+def validate_import_rows(rows: list, account_ids: dict, budget_ids: dict) -> tuple:
+    """
+    Validates the rows of a transaction import in one pass, and aggregates their effect on accounts and budgets.
+
+    Parameters:
+    - rows (list): The rows to import, with the same fields as the create transaction route.
+    - account_ids (dict): Account name to account id, for the existing accounts.
+    - budget_ids (dict): (lowered name, lowered month) to budget id, for the existing budgets.
+
+    Returns:
+    - tuple: The records to COPY, the net balance change per account id, the net amount change per budget id and the list of errors.
+    """
+    default_budget_id = get_default_budget_id()
+    records = []
+    account_deltas = {}
+    budget_deltas = {}
+    errors = []
+
+    for row_number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': row_number, 'detail': "Invalid row, expected an object."})
+            continue
+
+        try:
+            transaction_date = datetime.strptime(str(row.get('transaction_date', '')).strip(), '%Y-%m-%d')
+            transaction_amount = float(row.get('transaction_amount'))
+        except (TypeError, ValueError):
+            errors.append({'row': row_number, 'detail': "Invalid transaction date or amount."})
+            continue
+
+        transaction_type = str(row.get('transaction_type', '')).strip()
+        origin_account = str(row.get('origin_account') or '').strip()
+        destination_account = str(row.get('destination_account') or '').strip()
+        origin_account = origin_account if origin_account not in ('', 'None') else None
+        destination_account = destination_account if destination_account not in ('', 'None') else None
+        budget_name = str(row.get('budget_name') or '').strip()
+        budget_month = str(row.get('budget_month') or '').strip()
+
+        # Same checks as the create transaction route (NaN would pass the comparison)
+        if not math.isfinite(transaction_amount) or transaction_amount <= 0:
+            errors.append({'row': row_number, 'detail': "Transaction amount must be positive and greater than 0"})
+            continue
+        if transaction_type not in available_transactions_types:
+            errors.append({'row': row_number, 'detail': "Invalid transaction type."})
+            continue
+        if transaction_type in ('debit', 'transfert') and origin_account not in account_ids:
+            errors.append({'row': row_number, 'detail': "Unknown or missing origin account."})
+            continue
+        if transaction_type in ('credit', 'transfert') and destination_account not in account_ids:
+            errors.append({'row': row_number, 'detail': "Unknown or missing destination account."})
+            continue
+
+        if budget_name in ('', 'None'):
+            budget_id = default_budget_id
+        else:
+            budget_id = budget_ids.get((budget_name.lower(), budget_month.lower()))
+            if budget_id is None:
+                errors.append({'row': row_number, 'detail': "Unknown budget."})
+                continue
+
+        origin_account_id = account_ids.get(origin_account)
+        destination_account_id = account_ids.get(destination_account)
+        records.append((uuid.uuid4(), transaction_date, transaction_type, transaction_amount, origin_account, destination_account, budget_id,
+                        row.get('category') or "Unknown", row.get('recipient') or "Unknown", row.get('description') or "",
+                        origin_account_id, destination_account_id))
+
+        if transaction_type in ('debit', 'transfert'):
+            account_deltas[origin_account_id] = account_deltas.get(origin_account_id, 0) - transaction_amount
+        if transaction_type in ('credit', 'transfert'):
+            account_deltas[destination_account_id] = account_deltas.get(destination_account_id, 0) + transaction_amount
+        if str(budget_id) != default_budget_id:
+            budget_deltas[budget_id] = budget_deltas.get(budget_id, 0) - transaction_amount
+
+    return records, account_deltas, budget_deltas, errors
+
+
 """ 
 TRANSACTION ROUTES
 """
@@ -43,38 +206,185 @@ async def app_get_available_transaction_types(current_user: str = Depends(get_cu
 
 # Load Transaction Table
 @transaction_router.get(f"/api/{api_version}/table/transaction", name="load_transaction_table", tags=['transaction'])
-async def app_load_transaction_table(current_user: str = Depends(get_current_user)) -> dict:
+async def app_load_transaction_table(request: Request,
+                                     filters: dict = Depends(get_transaction_filters),
+                                     limit: int = Query(None, ge=1, le=1000),
+                                     cursor: str = None,
+                                     current_user: str = Depends(get_current_user)) -> dict:
     """
-    Load the existing transactions with all information from the transaction table.
+    Load the existing transactions from the transaction table, filtered and paginated by the database.
 
     Parameters:
+    - request (Request): The request, send "Accept: application/vnd.apache.arrow.stream" (or parquet) to get a columnar table (next cursor in the X-Next-Cursor header).
+    - filters (dict): The date range, type, account, budget, category and recipient filters, see get_transaction_filters.
+    - limit (int, optional): Page size, every matching transaction is returned when not set.
+    - cursor (str, optional): The next_cursor returned with the previous page.
     - current_user (str): The current user of the application.
 
     Returns:
-    - dict: A dictionary containing the transaction table.
+    - dict: A dictionary containing the transaction table (newest first) and the cursor of the next page, None on the last page.
+      304 without a body when the If-None-Match ETag is current.
+
+    """
+    # Unchanged table (same filters & page), no database scan
+    etag = table_etag(request, 'transaction', get_table_version('transactions'))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    keyset = decode_cursor(cursor) if cursor else None
 
+    # Fetch one extra transaction to know if there is a next page
+    try:
+        transaction_table = await query_transactions_page(filters=filters, cursor=keyset, limit=limit + 1 if limit else None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    next_cursor = None
+    if limit and len(transaction_table) > limit:
+        transaction_table = transaction_table[:limit]
+        next_cursor = encode_cursor(transaction_table[-1])
+
+    return table_response(request, 'transaction', transaction_table, metadata={'next_cursor': next_cursor}, etag=etag)
+
+
+# Export Transaction Table
+@transaction_router.get(f"/api/{api_version}/export/transaction", name="export_transaction_table", tags=['transaction'])
+async def app_export_transaction_table(export_format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+                                       filters: dict = Depends(get_transaction_filters),
+                                       current_user: str = Depends(get_current_user)) -> StreamingResponse:
     """
-    # Load existing transactions with all information from the transaction table
-    results = await query_for_informations(request_to_do='get_existing_transactions', additional=None)
-    transaction_table = [transaction for transaction in results]
-    return {'transaction table': transaction_table}
+    Stream the transactions matching the filters as NDJSON or CSV, newest first.
+
+    Rows are read from a server-side cursor and written as they arrive, so memory stays flat whatever the size of the export.
+
+    Parameters:
+    - export_format (str): "ndjson" (one JSON object per line) or "csv".
+    - filters (dict): The date range, type, account, budget, category and recipient filters, see get_transaction_filters.
+    - current_user (str): The current user of the application.
+
+    Returns:
+    - StreamingResponse: The exported transactions, as an attachment.
+
+    """
+    # Rows are buffered into ~64 KB chunks before being sent
+    chunk_size = 65536
+
+    async def generate_ndjson():
+        buffer = io.StringIO()
+        async for record in stream_transactions(filters=filters):
+            buffer.write(json.dumps(dict(record), default=str) + "\n")
+            if buffer.tell() >= chunk_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+
+    async def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        header_written = False
+        async for record in stream_transactions(filters=filters):
+            if not header_written:
+                writer.writerow(record.keys())
+                header_written = True
+            writer.writerow(record.values())
+            if buffer.tell() >= chunk_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        yield buffer.getvalue()
+
+    if export_format == "csv":
+        content, media_type = generate_csv(), "text/csv"
+    else:
+        content, media_type = generate_ndjson(), "application/x-ndjson"
+
+    return StreamingResponse(content,
+                             media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=transactions.{export_format}"})
+
+
+# Import Transactions
+@transaction_router.post(f"/api/{api_version}/import/transaction", name="import_transactions", tags=['transaction'])
+async def app_import_transactions(request: Request, current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Import many transactions at once from a CSV file or a JSON array, and apply them to the accounts and budgets.
+
+    Rows use the same fields as the create transaction route (transaction_date, transaction_type, transaction_amount,
+    origin_account, destination_account, budget_name, budget_month, category, recipient, description).
+    Every row is validated before anything is written, the rows are then loaded with COPY in a single transaction.
+
+    Parameters:
+    - request (Request): The request, its body is read as CSV when the content type is text/csv, as JSON otherwise.
+    - current_user (str): The current user of the application.
+
+    Returns:
+    - dict: A dictionary with a message indicating the number of imported transactions.
+
+    Raises:
+    - HTTPException: If the body cannot be parsed or if any row is invalid (nothing is imported).
+    """
+    body = await request.body()
+
+    try:
+        if request.headers.get("content-type", "").startswith("text/csv"):
+            rows = list(csv.DictReader(io.StringIO(body.decode("utf-8-sig"))))
+        else:
+            rows = json.loads(body)
+            if not isinstance(rows, list):
+                raise ValueError("A JSON array is expected.")
+    except (ValueError, csv.Error) as e: # csv.Error: malformed CSV (e.g. NUL bytes on Python 3.10, oversized fields)
+        raise HTTPException(status_code=400, detail=f"Could not parse the import: {e}")
+
+    if not rows:
+        raise HTTPException(status_code=400, detail="Nothing to import.")
+
+    # Load accounts and budgets once for the whole import
+    accounts, budgets = await asyncio.gather(query_for_informations(request_to_do='get_existing_accounts', additional=None),
+                                             query_for_informations(request_to_do='get_existing_budgets', additional=None))
+    account_ids = {account['name']: account['id'] for account in accounts}
+    budget_ids = {(budget['name'].strip().lower(), budget['month'].strip().lower()): budget['id'] for budget in budgets}
+
+    records, account_deltas, budget_deltas, errors = validate_import_rows(rows, account_ids, budget_ids)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
+    try:
+        imported = await query_bulk_import_transactions(records, account_deltas, budget_deltas)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"message": f"{imported} transactions imported & applied successfully."}
 
 
 # Display existing categories
 @transaction_router.get(f"/api/{api_version}/transaction/categories", name="get_existing_transaction_categories", tags=['transaction'])
 async def app_get_existing_transaction_categories(current_user: str = Depends(get_current_user)) -> dict:
     """
-    Retrieve the existing transaction categories from the database.
+    Retrieve the existing transaction categories from the categories dictionary (cached by the API).
 
     Returns:
-        A dictionary containing the existing categories as a list.
+        A dictionary containing the existing categories as a sorted list.
     """
-    results = await query_for_informations(request_to_do='get_existing_categories', additional=None)
-    existing_categories = [category['category'] for category in results]
+    existing_categories = await get_dictionary_names('categories')
 
     return {"existing categories": existing_categories}
 
 
+# Display existing recipients
+@transaction_router.get(f"/api/{api_version}/transaction/recipients", name="get_existing_transaction_recipients", tags=['transaction'])
+async def app_get_existing_transaction_recipients(current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Retrieve the existing transaction recipients from the recipients dictionary (cached by the API).
+
+    Returns:
+        A dictionary containing the existing recipients as a sorted list.
+    """
+    existing_recipients = await get_dictionary_names('recipients')
+
+    return {"existing recipients": existing_recipients}
+
+
 # Create Transaction
 @transaction_router.post(f"/api/{api_version}/create/transaction", name="create_transaction", tags=['transaction'])
 async def app_create_transaction(transaction_date: str,
@@ -109,8 +419,8 @@ async def app_create_transaction(transaction_date: str,
         dict: A dictionary with a message indicating the success of the transaction creation and application.
     """
     
-    # Check if balance <= 0
-    if transaction_amount <= 0:
+    # Check if balance <= 0 (NaN & infinity are rejected too)
+    if not math.isfinite(transaction_amount) or transaction_amount <= 0:
         raise HTTPException(status_code=400, detail="Transaction amount must be positive and greater than 0")
 
     # Check if transaction type is valid
@@ -122,25 +432,17 @@ async def app_create_transaction(transaction_date: str,
             raise HTTPException(status_code=400, detail="Origin account is required for debit transactions.")
     elif transaction_type == "credit" and destination_account == "None":
         raise HTTPException(status_code=400, detail="Destination account is required for credit transactions.")
-    elif transaction_type == "transfer" and (origin_account == "None" or destination_account == "None"):
+    elif transaction_type == "transfert" and (origin_account == "None" or destination_account == "None"):
         raise HTTPException(status_code=400, detail="Origin and destination accounts are required for transfer transactions.")
 
 
-    # If budget None, convert to default budget ID, else get budget ID
-    results = await query_for_informations(request_to_do='get_existing_budgets', additional=None)
-    print(results) # DEBUG
+    # If budget None, use the default budget ID (resolved at startup), else look the budget ID up by name & month
+    if budget_name is None or budget_name == "None":
+        budget_id = get_default_budget_id()
 
-    if budget_name is "None":
-        # Get default budget ID
-        default_budget_info = next((budget for budget in results if budget['name'].strip().lower() == 'default'), None)
-        budget_id = default_budget_info.get('id') if default_budget_info else None
-        default_budget = True
-        
     else:
-        # get the budget ID
-        budget_info = next((budget for budget in results if budget['name'].strip().lower() == budget_name.strip().lower() and budget['month'].strip().lower() == budget_month.strip().lower()), None)
-        budget_id = budget_info.get('id') if budget_info else None
-        default_budget = False
+        results = await query_for_informations(request_to_do='get_budget_id_by_name_and_month', additional=(budget_name, budget_month))
+        budget_id = results[0]['id'] if results else None
 
     # Convert date to timestamp
     transaction_date = datetime.strptime(transaction_date, '%Y-%m-%d')
@@ -148,19 +450,12 @@ async def app_create_transaction(transaction_date: str,
     # Generate transaction id
     transaction_id = await generate_uuid()
 
-    # Add the transaction in the table
-    values_to_apply = (transaction_id, transaction_date, transaction_type, transaction_amount, origin_account, destination_account, budget_id, category, recipient, description)
-    await query_insert_values(request_to_do='create_new_transaction', additional=values_to_apply)
-
-
-    # Apply the transaction to the account
-    values_to_apply = (transaction_type, transaction_amount, origin_account, destination_account)   
-    await query_insert_values(request_to_do='apply_transaction_to_accounts', additional=values_to_apply)
-
-    # Apply the transaction to the budget
-    if not default_budget:
-        values_to_apply = (transaction_amount, budget_id)
-        await query_insert_values(request_to_do='apply_transaction_to_budget', additional=values_to_apply)
+    # Add the transaction in the table & apply it to the accounts and the budget, in one statement
+    values_to_apply = (transaction_id, transaction_date, transaction_type, transaction_amount, origin_account, destination_account, budget_id, category, recipient, description, get_default_budget_id())
+    try:
+        await query_unit_of_work(request_to_do='create_transaction', additional=values_to_apply)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
     
     return {"message": "Transaction created & applied successfully."}
 
@@ -179,44 +474,58 @@ async def app_delete_transaction(transaction_id: str, current_user: str = Depend
         dict: A dictionary containing a success message.
 
     """
-    # Get transaction information
-    results = await query_for_informations(request_to_do="get_transaction_by_id", additional=transaction_id)
-    
-    transaction_info = results[0] if results else None
-    if not transaction_info:
+    try:
+        transaction_id = uuid.UUID(transaction_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid transaction id.")
+
+    # Delete the transaction & revert it on the accounts and the budget, in one statement
+    try:
+        results = await query_unit_of_work(request_to_do='delete_transaction', additional=(transaction_id, get_default_budget_id()))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not results['transactions']:
         raise HTTPException(status_code=404, detail="Transaction not found.")
 
-    transaction_type = transaction_info.get('type')
-    transaction_amount = transaction_info.get('amount')
-    origin_account = transaction_info.get('origin_account')
-    destination_account = transaction_info.get('destination_account')
-    budget_id = transaction_info.get('budget')
-
-    # Change the sign of amount
-    transaction_amount = -transaction_amount
-
+    
+    return {"message": f"Transaction with id {transaction_id} deleted successfully."}
 
-    # If transaction type is debit, add the amount back to the account
-    if transaction_type == 'debit':
-        values_to_apply = ('debit', transaction_amount, origin_account, destination_account)
-        await query_insert_values(request_to_do='apply_transaction_to_accounts', additional=values_to_apply)
 
-    # If transaction type is credit, remove the amount from the account
-    elif transaction_type == 'credit':
-        values_to_apply = ('credit', transaction_amount, origin_account, destination_account)
-        await query_insert_values(request_to_do='apply_transaction_to_accounts', additional=values_to_apply)
+# Bulk Delete Transactions
+@transaction_router.delete(f"/api/{api_version}/delete/transactions", name="bulk_delete_transactions", tags=['transaction'])
+async def app_bulk_delete_transactions(transaction_ids: List[str] = Query(None),
+                                       filters: dict = Depends(get_transaction_filters),
+                                       current_user: str = Depends(get_current_user)) -> dict:
+    """
+    Deletes several transactions, by ids and / or filters, and reverses them on the accounts and the budgets in one statement.
 
-    # If transaction type is transfer, add the amount back to the origin account and remove it from the destination account
-    elif transaction_type == 'transfer':
-        values_to_apply = ('transfer', transaction_amount, origin_account, destination_account)
-        await query_insert_values(request_to_do='apply_transaction_to_accounts', additional=values_to_apply)
+    Args:
+        transaction_ids (List[str], optional): The ids of the transactions to delete (repeat the query parameter).
+        filters (dict): The date range, type, account, budget, category and recipient filters, see get_transaction_filters.
+        current_user (str, optional): The current user. Defaults to Depends(get_current_user).
 
-    # Apply the transaction to the budget (add the amount back)
-    values_to_apply = (transaction_amount, budget_id)
-    await query_insert_values(request_to_do='apply_transaction_to_budget', additional=values_to_apply)
+    Returns:
+        dict: A dictionary with a message and the number of deleted transactions, updated accounts and updated budgets.
 
-    # Delete transaction
-    await query_insert_values(request_to_do='delete_transaction', additional=transaction_id)
+    Raises:
+        HTTPException: If an id is invalid, if neither ids nor filters are provided, or if no transaction matches.
+    """
+    if transaction_ids is not None:
+        try:
+            transaction_ids = [uuid.UUID(transaction_id) for transaction_id in transaction_ids]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid transaction id.")
+
+    # Delete the transactions & revert them on the accounts, the budgets and the rollup, in one statement
+    try:
+        results = await query_bulk_delete_transactions(transaction_ids=transaction_ids, filters=filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not results['transactions']:
+        raise HTTPException(status_code=404, detail="Transaction not found.")
 
-    
-    return {"message": f"Transaction with id {transaction_id} deleted successfully."}
+    return {"message": f"{results['transactions']} transactions deleted successfully.", **results}
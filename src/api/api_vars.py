@@ -30,8 +30,30 @@ async def generate_uuid():
 # Auth
 auth_limit = os.getenv("AUTH_LIMIT", "25/hour")
 
+# Comma-separated schemes, the first one hashes, the others are only verified (hashes are upgraded on login)
 crypt_context_scheme = os.getenv("CRYPT_CONTEXT_SCHEME")
-pwd_context = CryptContext(schemes=[crypt_context_scheme], deprecated="auto")
+# Optional argon2 parameters, a change makes existing hashes rehashed on the next login
+crypt_context_settings = {f"argon2__{setting}": int(os.getenv(env_var)) for setting, env_var in (("time_cost", "ARGON2_TIME_COST"),
+                                                                                                  ("memory_cost", "ARGON2_MEMORY_COST"),
+                                                                                                  ("parallelism", "ARGON2_PARALLELISM")) if os.getenv(env_var)}
+pwd_context = CryptContext(schemes=crypt_context_scheme.split(','), deprecated="auto", **crypt_context_settings)
+
+# Response compression | gzip above the minimum size (bytes)
+gzip_minimum_size = int(os.getenv("GZIP_MINIMUM_SIZE", 1024))
+gzip_compress_level = int(os.getenv("GZIP_COMPRESS_LEVEL", 6))
+
+# Request logs | JSON lines written by a background thread
+log_file = os.getenv("LOG_FILE", "api_logs.log")
+log_queue_size = int(os.getenv("LOG_QUEUE_SIZE", 10000)) # Records waiting to be written, the next ones are dropped
+log_sample_rate = float(os.getenv("LOG_SAMPLE_RATE", 1.0)) # Share of successful requests logged, errors are always logged
+log_body_max_bytes = int(os.getenv("LOG_BODY_MAX_BYTES", 1024)) # Request body bytes kept in the log
+
+# Verified tokens kept in memory, repeated requests skip the signature verification
+token_cache_size = int(os.getenv("TOKEN_CACHE_SIZE", 256))
+
+# Password hashing runs in a thread pool, out of the event loop
+password_hashing_workers = int(os.getenv("PASSWORD_HASHING_WORKERS", 2)) # Threads hashing passwords
+password_hashing_concurrency = int(os.getenv("PASSWORD_HASHING_CONCURRENCY", 4)) # Hashes running or queued at the same time, the next logins wait
 
 access_token_expiration = int(os.getenv("ACCESS_TOKEN_EXPIRATION"))
 algorithm = os.getenv("ALGORITHM")
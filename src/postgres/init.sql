@@ -24,6 +24,9 @@ CREATE TABLE IF NOT EXISTS accounts (
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- One account per name, also the lookup of the account ids by name (transactions)
+CREATE UNIQUE INDEX IF NOT EXISTS accounts_name_idx ON accounts (name);
+
 
 -- Budget table
 CREATE TABLE IF NOT EXISTS budgets (
@@ -34,6 +37,9 @@ CREATE TABLE IF NOT EXISTS budgets (
     created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Budget lookup by normalized (name, month), one budget per name & month
+CREATE UNIQUE INDEX IF NOT EXISTS budgets_name_month_idx ON budgets (lower(trim(name)), lower(trim(month)));
+
 -- Add budget with ID 0 and month "N/A" for the default budget (no budget)
 INSERT INTO budgets (id, name, month, amount)
 VALUES ('00000000-0000-0000-0000-000000000000', 'default', 'N/A', 0)
@@ -41,6 +47,19 @@ ON CONFLICT DO NOTHING;
 
 
 
+-- Category & recipient dictionaries, filled by the transactions trigger below
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    name VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS recipients (
+    id INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    name VARCHAR(255) NOT NULL UNIQUE
+);
+
+
+
 -- Transaction table
 CREATE TABLE IF NOT EXISTS transactions (
     id UUID PRIMARY KEY NOT NULL,
@@ -49,8 +68,94 @@ CREATE TABLE IF NOT EXISTS transactions (
     amount FLOAT CHECK(amount >= 0) NOT NULL,
     origin_account VARCHAR(255),
     destination_account VARCHAR(255),
+    origin_account_id UUID REFERENCES accounts(id) ON DELETE SET NULL,
+    destination_account_id UUID REFERENCES accounts(id) ON DELETE SET NULL,
     budget UUID REFERENCES budgets(id),
     recipient VARCHAR(255) NOT NULL,
     category VARCHAR(255),
-    description TEXT
-);
\ No newline at end of file
+    description TEXT,
+    category_id INTEGER REFERENCES categories(id),
+    recipient_id INTEGER REFERENCES recipients(id)
+);
+
+-- Transaction indexes (filters & keyset pagination on date, id)
+CREATE INDEX IF NOT EXISTS transactions_date_id_idx ON transactions (date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS transactions_type_date_idx ON transactions (type, date DESC);
+CREATE INDEX IF NOT EXISTS transactions_origin_account_date_idx ON transactions (origin_account, date DESC);
+CREATE INDEX IF NOT EXISTS transactions_destination_account_date_idx ON transactions (destination_account, date DESC);
+CREATE INDEX IF NOT EXISTS transactions_origin_account_id_idx ON transactions (origin_account_id);
+CREATE INDEX IF NOT EXISTS transactions_destination_account_id_idx ON transactions (destination_account_id);
+CREATE INDEX IF NOT EXISTS transactions_budget_date_idx ON transactions (budget, date DESC);
+CREATE INDEX IF NOT EXISTS transactions_category_date_idx ON transactions (category, date DESC);
+CREATE INDEX IF NOT EXISTS transactions_recipient_date_idx ON transactions (recipient, date DESC);
+CREATE INDEX IF NOT EXISTS transactions_category_id_idx ON transactions (category_id);
+CREATE INDEX IF NOT EXISTS transactions_recipient_id_idx ON transactions (recipient_id);
+
+-- Dictionary ids of the category & recipient, set on every insert (COPY included) and every change of the names
+CREATE OR REPLACE FUNCTION set_transaction_dictionary_ids() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.category_id := NULL;
+    IF NEW.category IS NOT NULL THEN
+        SELECT id INTO NEW.category_id FROM categories WHERE name = NEW.category;
+        IF NOT FOUND THEN
+            INSERT INTO categories (name) VALUES (NEW.category)
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id INTO NEW.category_id;
+        END IF;
+    END IF;
+
+    NEW.recipient_id := NULL;
+    IF NEW.recipient IS NOT NULL THEN
+        SELECT id INTO NEW.recipient_id FROM recipients WHERE name = NEW.recipient;
+        IF NOT FOUND THEN
+            INSERT INTO recipients (name) VALUES (NEW.recipient)
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id INTO NEW.recipient_id;
+        END IF;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER transactions_dictionary_ids
+BEFORE INSERT OR UPDATE OF category, recipient ON transactions
+FOR EACH ROW EXECUTE FUNCTION set_transaction_dictionary_ids();
+
+
+-- Monthly rollup of the transactions, maintained by the API with every insert & delete
+-- account: origin account for debits & transfers, destination account for credits
+CREATE TABLE IF NOT EXISTS transaction_monthly_rollup (
+    month DATE NOT NULL,
+    category VARCHAR(255) NOT NULL DEFAULT '',
+    account VARCHAR(255) NOT NULL DEFAULT '',
+    budget UUID NOT NULL,
+    type VARCHAR(255) NOT NULL,
+    amount FLOAT NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, category, account, budget, type)
+);
+
+-- Rebuild the rollup from the transactions (backfills): SELECT rebuild_transaction_monthly_rollup();
+CREATE OR REPLACE FUNCTION rebuild_transaction_monthly_rollup() RETURNS INTEGER AS $$
+DECLARE
+    rollup_rows INTEGER;
+BEGIN
+    LOCK TABLE transactions IN SHARE MODE;
+    DELETE FROM transaction_monthly_rollup;
+
+    INSERT INTO transaction_monthly_rollup (month, category, account, budget, type, amount, transaction_count)
+    SELECT date_trunc('month', date)::date,
+           COALESCE(category, ''),
+           COALESCE(CASE WHEN type = 'credit' THEN destination_account ELSE origin_account END, ''),
+           COALESCE(budget, '00000000-0000-0000-0000-000000000000'),
+           type,
+           SUM(amount),
+           COUNT(*)
+    FROM transactions
+    GROUP BY 1, 2, 3, 4, 5;
+
+    GET DIAGNOSTICS rollup_rows = ROW_COUNT;
+    RETURN rollup_rows;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,49 @@
+-- Migration 001 | Reference accounts by id in the transactions
+-- Adds origin_account_id & destination_account_id (foreign keys to accounts, indexed) and fills them from the account names.
+-- Rows are rewritten in batches, each committed on its own, so locks stay short and the table stays usable.
+-- Run with psql, outside of a transaction block (the procedure commits):
+-- psql -h localhost -U root -d bank_db -f 001_transaction_account_ids.sql
+
+
+-- Columns & indexes (same as init.sql)
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS origin_account_id UUID REFERENCES accounts(id) ON DELETE SET NULL;
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS destination_account_id UUID REFERENCES accounts(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS accounts_name_idx ON accounts (name);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_origin_account_id_idx ON transactions (origin_account_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_destination_account_id_idx ON transactions (destination_account_id);
+
+
+-- Backfill in batches, the oldest account wins when names repeat (as in the API)
+CREATE OR REPLACE PROCEDURE backfill_transaction_account_ids(batch_size INTEGER DEFAULT 5000)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated_rows INTEGER;
+    total_rows BIGINT := 0;
+BEGIN
+    LOOP
+        UPDATE transactions AS t
+        SET origin_account_id = COALESCE(t.origin_account_id, (SELECT a.id FROM accounts a WHERE a.name = t.origin_account ORDER BY a.created_at LIMIT 1)),
+            destination_account_id = COALESCE(t.destination_account_id, (SELECT a.id FROM accounts a WHERE a.name = t.destination_account ORDER BY a.created_at LIMIT 1))
+        WHERE t.id IN (
+            SELECT b.id
+            FROM transactions b
+            WHERE (b.origin_account_id IS NULL AND EXISTS (SELECT 1 FROM accounts a WHERE a.name = b.origin_account))
+               OR (b.destination_account_id IS NULL AND EXISTS (SELECT 1 FROM accounts a WHERE a.name = b.destination_account))
+            LIMIT batch_size
+        );
+
+        GET DIAGNOSTICS updated_rows = ROW_COUNT;
+        EXIT WHEN updated_rows = 0;
+
+        total_rows := total_rows + updated_rows;
+        COMMIT;
+        RAISE NOTICE 'backfill_transaction_account_ids: % rows updated', total_rows;
+    END LOOP;
+END;
+$$;
+
+CALL backfill_transaction_account_ids();
+
+DROP PROCEDURE backfill_transaction_account_ids(INTEGER);
@@ -0,0 +1,12 @@
+-- Migration 002 | One account per name
+-- Replaces the lookup index of accounts.name (migration 001) by a unique index, the API then rejects duplicates
+-- with INSERT ... ON CONFLICT DO NOTHING (budgets are unique by normalized name & month, see migration 005).
+-- Duplicated names must be renamed first, list them with:
+-- SELECT name, count(*) FROM accounts GROUP BY name HAVING count(*) > 1;
+-- Run with psql, outside of a transaction block (the index is built concurrently):
+-- psql -h localhost -U root -d bank_db -f 002_unique_account_names.sql
+
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS accounts_name_unique_idx ON accounts (name);
+DROP INDEX CONCURRENTLY IF EXISTS accounts_name_idx;
+ALTER INDEX accounts_name_unique_idx RENAME TO accounts_name_idx;
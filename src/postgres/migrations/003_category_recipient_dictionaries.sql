@@ -0,0 +1,99 @@
+-- Migration 003 | Category & recipient dictionaries
+-- Adds the categories & recipients tables (integer ids), the category_id & recipient_id columns of the transactions
+-- and the trigger filling them on insert, then seeds the dictionaries and backfills the ids.
+-- Rows are rewritten in batches, each committed on its own, so locks stay short and the table stays usable.
+-- Run with psql, outside of a transaction block (the procedure commits):
+-- psql -h localhost -U root -d bank_db -f 003_category_recipient_dictionaries.sql
+
+
+-- Tables, columns, indexes & trigger (same as init.sql)
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    name VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS recipients (
+    id INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    name VARCHAR(255) NOT NULL UNIQUE
+);
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS category_id INTEGER REFERENCES categories(id);
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS recipient_id INTEGER REFERENCES recipients(id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_category_id_idx ON transactions (category_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS transactions_recipient_id_idx ON transactions (recipient_id);
+
+CREATE OR REPLACE FUNCTION set_transaction_dictionary_ids() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.category_id := NULL;
+    IF NEW.category IS NOT NULL THEN
+        SELECT id INTO NEW.category_id FROM categories WHERE name = NEW.category;
+        IF NOT FOUND THEN
+            INSERT INTO categories (name) VALUES (NEW.category)
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id INTO NEW.category_id;
+        END IF;
+    END IF;
+
+    NEW.recipient_id := NULL;
+    IF NEW.recipient IS NOT NULL THEN
+        SELECT id INTO NEW.recipient_id FROM recipients WHERE name = NEW.recipient;
+        IF NOT FOUND THEN
+            INSERT INTO recipients (name) VALUES (NEW.recipient)
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id INTO NEW.recipient_id;
+        END IF;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER transactions_dictionary_ids
+BEFORE INSERT OR UPDATE OF category, recipient ON transactions
+FOR EACH ROW EXECUTE FUNCTION set_transaction_dictionary_ids();
+
+
+-- Seed the dictionaries with the existing names
+INSERT INTO categories (name)
+SELECT DISTINCT category FROM transactions WHERE category IS NOT NULL
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO recipients (name)
+SELECT DISTINCT recipient FROM transactions WHERE recipient IS NOT NULL
+ON CONFLICT (name) DO NOTHING;
+
+
+-- Backfill in batches (the trigger does not fire, only the id columns are set)
+CREATE OR REPLACE PROCEDURE backfill_transaction_dictionary_ids(batch_size INTEGER DEFAULT 5000)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    updated_rows INTEGER;
+    total_rows BIGINT := 0;
+BEGIN
+    LOOP
+        UPDATE transactions AS t
+        SET category_id = (SELECT c.id FROM categories c WHERE c.name = t.category),
+            recipient_id = (SELECT r.id FROM recipients r WHERE r.name = t.recipient)
+        WHERE t.id IN (
+            SELECT b.id
+            FROM transactions b
+            WHERE (b.category_id IS NULL AND b.category IS NOT NULL)
+               OR (b.recipient_id IS NULL AND b.recipient IS NOT NULL)
+            LIMIT batch_size
+        );
+
+        GET DIAGNOSTICS updated_rows = ROW_COUNT;
+        EXIT WHEN updated_rows = 0;
+
+        total_rows := total_rows + updated_rows;
+        COMMIT;
+        RAISE NOTICE 'backfill_transaction_dictionary_ids: % rows updated', total_rows;
+    END LOOP;
+END;
+$$;
+
+CALL backfill_transaction_dictionary_ids();
+
+DROP PROCEDURE backfill_transaction_dictionary_ids(INTEGER);
@@ -0,0 +1,48 @@
+-- Migration 004 | Monthly rollup of the transactions
+-- Adds transaction_monthly_rollup & rebuild_transaction_monthly_rollup() to databases created before the rollup,
+-- then fills it once from the transactions. The API writes it with every transaction insert & delete, so run this
+-- migration before starting the API on an existing database.
+-- Run with psql (the rebuild locks the transactions against writes while it runs):
+-- psql -h localhost -U root -d bank_db -f 004_transaction_monthly_rollup.sql
+
+
+-- Table & rebuild function (same as init.sql)
+-- account: origin account for debits & transfers, destination account for credits
+CREATE TABLE IF NOT EXISTS transaction_monthly_rollup (
+    month DATE NOT NULL,
+    category VARCHAR(255) NOT NULL DEFAULT '',
+    account VARCHAR(255) NOT NULL DEFAULT '',
+    budget UUID NOT NULL,
+    type VARCHAR(255) NOT NULL,
+    amount FLOAT NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, category, account, budget, type)
+);
+
+-- Rebuild the rollup from the transactions (backfills): SELECT rebuild_transaction_monthly_rollup();
+CREATE OR REPLACE FUNCTION rebuild_transaction_monthly_rollup() RETURNS INTEGER AS $$
+DECLARE
+    rollup_rows INTEGER;
+BEGIN
+    LOCK TABLE transactions IN SHARE MODE;
+    DELETE FROM transaction_monthly_rollup;
+
+    INSERT INTO transaction_monthly_rollup (month, category, account, budget, type, amount, transaction_count)
+    SELECT date_trunc('month', date)::date,
+           COALESCE(category, ''),
+           COALESCE(CASE WHEN type = 'credit' THEN destination_account ELSE origin_account END, ''),
+           COALESCE(budget, '00000000-0000-0000-0000-000000000000'),
+           type,
+           SUM(amount),
+           COUNT(*)
+    FROM transactions
+    GROUP BY 1, 2, 3, 4, 5;
+
+    GET DIAGNOSTICS rollup_rows = ROW_COUNT;
+    RETURN rollup_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Backfill
+SELECT rebuild_transaction_monthly_rollup();
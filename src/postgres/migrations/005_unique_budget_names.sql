@@ -0,0 +1,11 @@
+-- Migration 005 | One budget per normalized name & month
+-- Adds the unique lookup index of budgets by (lower(trim(name)), lower(trim(month))) to databases created before it.
+-- The API resolves budgets with it and rejects duplicates with INSERT ... ON CONFLICT DO NOTHING (create & rollover).
+-- Duplicated budgets must be renamed or merged first, list them with:
+-- SELECT lower(trim(name)), lower(trim(month)), count(*) FROM budgets GROUP BY 1, 2 HAVING count(*) > 1;
+-- If the build fails on duplicates, it leaves an invalid index: DROP INDEX budgets_name_month_idx; before running again.
+-- Run with psql, outside of a transaction block (the index is built concurrently):
+-- psql -h localhost -U root -d bank_db -f 005_unique_budget_names.sql
+
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS budgets_name_month_idx ON budgets (lower(trim(name)), lower(trim(month)));
@@ -1,17 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
 from matplotlib import cm
 import numpy as np
 import os
 import pandas as pd
+import pyarrow as pa
 import requests
+from requests.adapters import HTTPAdapter
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import threading
 import time
+from urllib3.util.retry import Retry
 
 
 # API VARS
 api_version = os.getenv("API_VERSION", "0.2.0")
 api_url = os.getenv("API_URL", "http://localhost:8000")
 
+# TABLE FORMAT VARS
+arrow_media_type = "application/vnd.apache.arrow.stream" # Typed columnar tables, no JSON parsing on either side
+
+# CACHE VARS
+cache_ttl = int(os.getenv("STREAMLIT_CACHE_TTL", 120)) # Seconds before a cached API response is fetched again
+
+# Last table received for each request with its ETag, revalidated once the cache expires (304 Not Modified, no body)
+table_etag_store = {}
+table_etag_store_size = 32
+
+# HTTP VARS
+http_timeout = float(os.getenv("STREAMLIT_HTTP_TIMEOUT", 10)) # Seconds before an API request is abandoned
+http_retries = int(os.getenv("STREAMLIT_HTTP_RETRIES", 3)) # Retries of failed GET requests (connection errors, 502, 503, 504)
+http_pool_size = int(os.getenv("STREAMLIT_HTTP_POOL_SIZE", 10)) # Keep-alive connections kept open to the API
+
 login_placeholder = st.sidebar.empty()
 
 
@@ -43,12 +64,43 @@ def message_display(message, time_displayed:int, success=False) -> None:
 
 
 
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter applying `http_timeout` to every request that does not set its own timeout.
+    """
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = http_timeout
+        return super().send(request, **kwargs)
+
+
+def get_http_session() -> requests.Session:
+    """
+    Returns the HTTP session of the current Streamlit session, created on first use.
+
+    The session keeps its connections to the API alive, retries failed GET requests and applies a default timeout.
+
+    Returns:
+        requests.Session: The pooled HTTP session.
+    """
+    if 'http_session' not in st.session_state:
+        retries = Retry(total=http_retries, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=frozenset(["GET"]))
+        adapter = TimeoutHTTPAdapter(max_retries=retries, pool_connections=http_pool_size, pool_maxsize=http_pool_size)
+
+        http_session = requests.Session()
+        http_session.mount("http://", adapter)
+        http_session.mount("https://", adapter)
+        st.session_state.http_session = http_session
+
+    return st.session_state.http_session
+
+
 def get_api_status() -> None:
     """
     Request the api to get the status, block app if API is not responsding (or bad version)
     """
     url = f"{api_url}/api/{api_version}/status"
-    response = requests.get(url)
+    response = get_http_session().get(url)
     if response.status_code != 200:
         st.error("Error while checking API status.")
         st.stop()
@@ -60,7 +112,7 @@ def validate_credentials(login_data: dict) -> None:
     """
     # Request API
     url = f"{api_url}/api/{api_version}/login"
-    response = requests.post(url, data=login_data)
+    response = get_http_session().post(url, data=login_data)
     if response.status_code == 200:
         access_token = response.json().get("access_token")
         login_placeholder.empty()
@@ -71,6 +123,121 @@ def validate_credentials(login_data: dict) -> None:
         st.sidebar.error("Incorrect Username or Password.")
   
 
+@st.cache_data(ttl=cache_ttl, show_spinner=False)
+def cached_api_get(route: str, access_token: str, params: dict = None, _http_session: requests.Session = None):
+    """
+    Sends a GET request to the API and caches the JSON response.
+
+    The cache is keyed by route, access token and query parameters, entries expire after `cache_ttl` seconds
+    and every entry is dropped by invalidate_api_cache when data is written.
+
+    Parameters:
+    - route (str): The route, after /api/<version>/ (e.g. "table/account").
+    - access_token (str): The access token of the current session.
+    - params (dict, optional): The query parameters.
+    - _http_session (requests.Session, optional): The session to send the request with, the one of the current Streamlit session by default (not part of the cache key).
+
+    Returns:
+    - The JSON response.
+
+    Raises:
+    - requests.HTTPError: If the API does not answer with a success status (the error is not cached).
+    """
+    url = f"{api_url}/api/{api_version}/{route}"
+    headers = {"accept": "application/json", "Authorization": f"Bearer {access_token}"}
+    http_session = _http_session or get_http_session()
+    response = http_session.get(url, params=params, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+@st.cache_data(ttl=cache_ttl, show_spinner=False)
+def cached_api_get_table(route: str, access_token: str, params: dict = None, _http_session: requests.Session = None) -> pd.DataFrame:
+    """
+    Sends a GET request to an API table route, asking for an Arrow stream, and caches the DataFrame.
+
+    Money columns arrive as float64 and dates as timestamps, nothing has to be parsed or converted.
+    Cached like cached_api_get, and dropped by invalidate_api_cache. Once the entry expires, the last table received
+    is revalidated with its ETag: an unchanged table comes back as 304 Not Modified, without a body.
+
+    Parameters:
+    - route (str): The table route, after /api/<version>/ (e.g. "table/account").
+    - access_token (str): The access token of the current session.
+    - params (dict, optional): The query parameters.
+    - _http_session (requests.Session, optional): The session to send the request with, the one of the current Streamlit session by default (not part of the cache key).
+
+    Returns:
+    - pd.DataFrame: The table.
+
+    Raises:
+    - requests.HTTPError: If the API does not answer with a success status (the error is not cached).
+    """
+    url = f"{api_url}/api/{api_version}/{route}"
+    headers = {"accept": arrow_media_type, "Authorization": f"Bearer {access_token}"}
+
+    store_key = (route, access_token, tuple(sorted((params or {}).items())))
+    stored_table = table_etag_store.get(store_key)
+    if stored_table is not None:
+        headers["If-None-Match"] = stored_table[0]
+
+    http_session = _http_session or get_http_session()
+    response = http_session.get(url, params=params, headers=headers)
+    if response.status_code == 304 and stored_table is not None:
+        return stored_table[1]
+    response.raise_for_status()
+    df = pa.ipc.open_stream(response.content).read_pandas()
+
+    etag = response.headers.get("ETag")
+    if etag:
+        table_etag_store.pop(store_key, None)
+        table_etag_store[store_key] = (etag, df)
+        while len(table_etag_store) > table_etag_store_size:
+            table_etag_store.pop(next(iter(table_etag_store)))
+
+    return df
+
+
+def prefetch_api_gets(routes: list) -> None:
+    """
+    Sends independent GET requests at the same time to fill the cache, so a page waits for the slowest request only.
+
+    Parameters:
+    - routes (list): The routes to fetch, without query parameters (e.g. ["table/account", "table/budget"]), tables are fetched as Arrow streams.
+    """
+    access_token = st.session_state.access_token
+    http_session = get_http_session()
+    script_run_ctx = get_script_run_ctx()
+
+    def attach_script_run_ctx():
+        add_script_run_ctx(threading.current_thread(), script_run_ctx)
+
+    with ThreadPoolExecutor(max_workers=len(routes), initializer=attach_script_run_ctx) as executor:
+        # Same arguments as the readers (e.g. get_account_table), so the cache keys match
+        futures = [executor.submit(cached_api_get_table if route.startswith("table/") else cached_api_get, route, access_token, _http_session=http_session) for route in routes]
+        for future in futures:
+            future.result()
+
+
+def invalidate_api_cache() -> None:
+    """
+    Drops every cached API response, called after each successful create or delete.
+    """
+    cached_api_get.clear()
+    cached_api_get_table.clear()
+
+
+def display_table(df: pd.DataFrame) -> None:
+    """
+    Displays a table, money columns (balance, amount) and dates (date, created_at) stay typed and are only formatted for display.
+
+    Parameters:
+    - df (pd.DataFrame): The table to display.
+    """
+    column_config = {column: st.column_config.NumberColumn(format="%.2f €") for column in ("balance", "amount") if column in df.columns}
+    column_config.update({column: st.column_config.DatetimeColumn(format="YYYY-MM-DD") for column in ("date", "created_at") if column in df.columns})
+    st.dataframe(df, column_config=column_config)
+
+
 def get_account_table() -> pd.DataFrame:
     """
     Retrieves the account table from the API and returns it as a pandas DataFrame.
@@ -78,17 +245,11 @@ def get_account_table() -> pd.DataFrame:
     Returns:
         pd.DataFrame: The account table with columns: "name", "type", "balance", and "created_at".
     """
-    # Request API
-    url = f"{api_url}/api/{api_version}/table/account"
-    account_table = requests.get(url, headers=st.session_state.headers)
-    account_table = dict(account_table.json())
-    account_table = account_table['account table']
+    # Request API (cached, Arrow stream)
+    df_accounts = cached_api_get_table("table/account", st.session_state.access_token)
 
     # Generate DF
-    df_accounts = pd.DataFrame(account_table, columns=["id", "name", "type", "balance", "owner_id", "created_at"])
-    df_accounts["balance"] = df_accounts["balance"].apply(lambda x: f"{x:.2f} €")
-    df_accounts.drop(columns=["id", "owner_id"], inplace=True)
-    df_accounts["created_at"] = df_accounts["created_at"].str.split("T").str[0]
+    df_accounts = df_accounts.reindex(columns=["name", "type", "balance", "created_at"])
 
     return df_accounts
 
@@ -101,46 +262,40 @@ def get_budget_table() -> pd.DataFrame:
         df_budgets (pd.DataFrame): The budget table as a pandas DataFrame.
         budget_id_to_name (dict): A dictionary mapping budget IDs to budget names.
     """
-    # Request API
-    url = f"{api_url}/api/{api_version}/table/budget"
-    budget_table = requests.get(url, headers=st.session_state.headers)
-    budget_table = budget_table.json()
-    budget_table = budget_table["budget table"]
+    # Request API (cached, Arrow stream)
+    df_budgets = cached_api_get_table("table/budget", st.session_state.access_token)
 
     # Generate DF
-    df_budgets = pd.DataFrame(budget_table, columns=["id", "name", "month", "amount","created_at"])
-    df_budgets["amount"] = df_budgets["amount"].apply(lambda x: f"{x:.2f} €")
+    df_budgets = df_budgets.reindex(columns=["id", "name", "month", "amount", "created_at"])
 
     # Create a dictionary mapping from id to name in df_budgets (used for df_transactions)
     budget_id_to_name = pd.Series(df_budgets.name.values, index=df_budgets.id).to_dict()
 
-    df_budgets.drop(columns=["id"], inplace=True)
-    df_budgets["created_at"] = df_budgets["created_at"].str.split("T").str[0]
+    df_budgets = df_budgets.drop(columns=["id"])
 
     return df_budgets, budget_id_to_name
 
 
-def get_transaction_table(budget_id_to_name) -> pd.DataFrame:
+def get_transaction_table(budget_id_to_name, params: dict = None) -> pd.DataFrame:
     """
     Retrieves the transaction table from the API and returns it as a pandas DataFrame.
 
     Parameters:
     - budget_id_to_name (dict): A dictionary mapping budget IDs to their corresponding names.
+    - params (dict, optional): The query parameters of the table route (limit, start_date, end_date, transaction_type, account, budget, category, recipient), every transaction by default.
 
     Returns:
     - df_transactions (pd.DataFrame): The transaction table as a pandas DataFrame, with columns for date, type, amount, origin account, destination account, budget, recipient, category, and description.
     """
 
-    # Request API
-    url = f"{api_url}/api/{api_version}/table/transaction"
-    transaction_table = requests.get(url, headers=st.session_state.headers)
-    transaction_table = dict(transaction_table.json())
-    transaction_table = transaction_table['transaction table']
+    # Request API (cached, Arrow stream), params only passed when set so the cache key matches prefetch_api_gets
+    if params:
+        df_transactions = cached_api_get_table("table/transaction", st.session_state.access_token, params=params)
+    else:
+        df_transactions = cached_api_get_table("table/transaction", st.session_state.access_token)
 
     # Generate DF
-    df_transactions = pd.DataFrame(transaction_table, columns=["id", "date", "type", "amount", "origin_account", "destination_account", "budget", "recipient", "category", "description"])
-    df_transactions["date"] = df_transactions["date"].str.split("T").str[0]
-    df_transactions["amount"] = df_transactions["amount"].apply(lambda x: f"{x:.2f} €")
+    df_transactions = df_transactions.reindex(columns=["id", "date", "type", "amount", "origin_account", "destination_account", "budget", "recipient", "category", "description"])
 
     # Map each budget id in df_transactions to its corresponding name using the dictionary
     df_transactions["budget_name"] = df_transactions["budget"].map(budget_id_to_name).fillna("None")
@@ -168,9 +323,10 @@ def post_transaction_creation(transaction_data: dict) -> None:
     """
     url = f"{api_url}/api/{api_version}/create/transaction"
 
-    response = requests.post(url, params=transaction_data, headers=st.session_state.headers)
+    response = get_http_session().post(url, params=transaction_data, headers=st.session_state.headers)
 
     if response.status_code == 200:
+        invalidate_api_cache()
         message_display(response.json(), 3, success=True)
         time.sleep(3)
     else:
@@ -180,30 +336,57 @@ def post_transaction_creation(transaction_data: dict) -> None:
 
 
 
-def delete_transaction(transaction_id_to_remove: str) -> None:
+def delete_transactions(transaction_ids_to_remove: list) -> None:
     """
-    Deletes a transaction with the specified transaction ID.
+    Deletes several transactions at once, their effect on accounts and budgets is reverted by the API in one statement.
 
     Parameters:
-        transaction_id_to_remove (str): The ID of the transaction to be deleted.
+        transaction_ids_to_remove (list): The IDs of the transactions to be deleted.
 
     Returns:
         None
-
-    Raises:
-        None
     """
-    url = f"{api_url}/api/{api_version}/delete/transaction"
-    params = {'transaction_id': transaction_id_to_remove}
-    response = requests.delete(url, params=params, headers=st.session_state.headers)
-    st.write(response) # Debug
+    url = f"{api_url}/api/{api_version}/delete/transactions"
+    params = {'transaction_ids': transaction_ids_to_remove}
+    response = get_http_session().delete(url, params=params, headers=st.session_state.headers)
 
     if response.status_code == 200:
-        message_display(response.json(), 3, success=True)
-        time.sleep(3)
+        invalidate_api_cache()
+        message_display(response.json()["message"], 3, success=True)
     else:
         message_display(response.json(), 5, success=False)
-        time.sleep(5)
+
+
+
+def get_analytics_table(route: str, params: dict, columns: list) -> pd.DataFrame:
+    """
+    Retrieves an aggregation computed by one of the API analytics routes.
+
+    Parameters:
+    - route (str): "totals", "temporal" or "time_series".
+    - params (dict): The query parameters (group_by / display_by, transaction_type, year, month, weekday).
+    - columns (list): The columns of the returned rows.
+
+    Returns:
+    - pd.DataFrame: The aggregated rows, with the given columns.
+    """
+    response = cached_api_get(f"analytics/{route}", st.session_state.access_token, params)
+    rows = response["time series"] if route == "time_series" else response["totals"]
+
+    return pd.DataFrame(rows, columns=columns)
+
+
+def get_analytics_periods(params: dict) -> dict:
+    """
+    Retrieves the years, months and weekdays having transactions, to build the analytics filters.
+
+    Parameters:
+    - params (dict): The query parameters (transaction_type, year, month, weekday).
+
+    Returns:
+    - dict: The "years", "months" and "weekdays" lists, in calendar order.
+    """
+    return cached_api_get("analytics/periods", st.session_state.access_token, params)
 
 
 
@@ -229,7 +412,7 @@ def get_bar_chart(df, name, amount, legend=None):
 
     for bar in bars:
         height = bar.get_height()
-        plt.text(bar.get_x() + bar.get_width() / 2, height - (height*0.05), f'{height}'+"€", ha='center', va='top', color='white') 
+        plt.text(bar.get_x() + bar.get_width() / 2, height - (height*0.05), f'{height:.2f} €', ha='center', va='top', color='white') 
 
     plt.title(f"{name} expenses")
     plt.xlabel(name, fontweight='bold')
@@ -245,27 +428,18 @@ def get_bar_chart(df, name, amount, legend=None):
 
 def get_time_series(df):
     """
-    Calculate the cumulative sum of expenses over time and plot the results.
+    Plot the cumulative sum of expenses over time.
     
     Parameters:
-    - df (pandas.DataFrame): The input DataFrame containing the expenses data.
+    - df (pandas.DataFrame): The monthly time series computed by the API, with "year_month" and "cumsum" columns.
     
     Returns:
     None
     """
-    # Convert 'date' to datetime format
-    df['date'] = pd.to_datetime(df['date'])
-    
-    df['year_month'] = df['date'].dt.to_period('M')
-    df = df.groupby('year_month')['amount'].sum().reset_index()
-    
-    # Calculate cumulative sum
-    df["cumsum"] = df["amount"].cumsum()
-
     # Plot
     fig = plt.figure(figsize=(10, 5))
-    plt.plot(df['year_month'].astype(str), df["cumsum"], color="blue")  # Convert 'year_month' to string for plotting
-    plt.fill_between(df['year_month'].astype(str), df["cumsum"], color="blue", alpha=0.3)
+    plt.plot(df['year_month'], df["cumsum"], color="blue")
+    plt.fill_between(df['year_month'], df["cumsum"], color="blue", alpha=0.3)
     plt.title("Cumulative expenses over time")
     plt.xlabel("Date", fontweight='bold')
     plt.xticks(rotation=75)
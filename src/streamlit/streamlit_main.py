@@ -3,15 +3,14 @@
 """
 
 # LIBS
-import calendar
-import pandas as pd
-import requests
 import streamlit as st
 
 from streamlit_api_requests_functions import api_version, api_url
 from streamlit_api_requests_functions import get_api_status, validate_credentials, get_account_table, get_budget_table, get_transaction_table
-from streamlit_api_requests_functions import post_transaction_creation, delete_transaction
-from streamlit_api_requests_functions import get_bar_chart, get_time_series
+from streamlit_api_requests_functions import post_transaction_creation, delete_transactions
+from streamlit_api_requests_functions import cached_api_get, invalidate_api_cache, get_http_session, prefetch_api_gets
+from streamlit_api_requests_functions import get_analytics_table, get_analytics_periods
+from streamlit_api_requests_functions import get_bar_chart, get_time_series, display_table
 
 
 # VARS
@@ -44,9 +43,9 @@ if 'new_category' not in st.session_state:  # ADDED IN 0.2.1
 
 # Initialize session state for search and delete actions
 if 'search_transaction_by_id_button_clicked' not in st.session_state:
-    st.session_state.search_button_clicked = False
+    st.session_state.search_transaction_by_id_button_clicked = False
 if 'transaction_id_to_remove' not in st.session_state:
-    st.session_state.transaction_id_to_remove = None
+    st.session_state.transaction_id_to_remove = []
 
 
 
@@ -111,12 +110,13 @@ if page == pages[0]:
     st.title("Overview")
 
     ## Get Tables
+    # Fetch the account & budget tables at the same time, the calls below then read the cache (transactions are fetched with their filters)
+    prefetch_api_gets(["table/account", "table/budget"])
+
     # Get account table
     df_accounts = get_account_table()
     # Get budget table
     df_budgets, budget_id_to_name = get_budget_table()
-    # Get transaction table
-    df_transactions = get_transaction_table(budget_id_to_name)
 
 
 
@@ -149,8 +149,8 @@ if page == pages[0]:
 
     # Interactive display of accounts
     with st.expander("View Accounts"):
-        st.dataframe(df_accounts)
-        total_displayed_accounts_amount = df_accounts["balance"].apply(lambda x: float(x.split(" ")[0])).sum()
+        display_table(df_accounts)
+        total_displayed_accounts_amount = df_accounts["balance"].sum()
         st.markdown(f"**Total amount in displayed accounts:** {total_displayed_accounts_amount:.2f} €", unsafe_allow_html=True)
 
 
@@ -194,8 +194,8 @@ if page == pages[0]:
 
     # Interactive display of budgets
     with st.expander("View Budgets"):
-        st.dataframe(df_budgets)
-        total_displayed_budgets_amount = df_budgets["amount"].apply(lambda x: float(x.split(" ")[0])).sum()
+        display_table(df_budgets)
+        total_displayed_budgets_amount = df_budgets["amount"].sum()
         st.markdown(f"**Total amount in displayed budgets:** {total_displayed_budgets_amount:.2f} €", unsafe_allow_html=True)
 
 
@@ -203,101 +203,73 @@ if page == pages[0]:
     ## Display Transactions
     st.subheader("Transactions")
 
-    # Filters
+    # Filters, sent to the API as query parameters (only the matching transactions are downloaded)
     with st.expander("Transaction Filters"):
         elt_to_display_col, sortby_col, filter_col = st.columns(3)
+        transaction_params = {}
 
-        # Elt to display button
+        # Elt to display button (the newest transactions first)
         with elt_to_display_col:
             filters = [x for x in elt_to_display]
             filter_value = st.selectbox('Display:', filters, key="nb_elts_to_display_by_transactions")
             if filter_value != "All":
-                df_transactions = df_transactions.head(int(filter_value))
-
-
-        # Sort by button
-        with sortby_col:
-            sort_by = st.selectbox('Sort by:', df_transactions.columns, key="sort_by_transactions")
-            df_transactions = df_transactions.sort_values(sort_by)
+                transaction_params["limit"] = filter_value
 
 
         # Filter button
         with filter_col:
-            # Initialize available filters
-            selected_filters = {
-                "month": None,
-                "type": None,
-                "origin_account": None,
-                "destination_account": None,
-                "budget": None,
-                "recipient": None,
-                "category": None
-            }
+            # Available filters, the options come from the API lookups, not from the transactions
+            available_filters = ["date", "type", "account", "budget", "recipient", "category"]
 
             # Display checkboxes for each filter
-            for filter_name in selected_filters.keys():
+            for filter_name in available_filters:
                 if st.checkbox(f'Filter by {filter_name}', key=f'checkbox_{filter_name}'):
                     # Display filter options based on filter_name
-                    if filter_name == "month":
-                        df_transactions["date"] = pd.to_datetime(df_transactions["date"])
-                        df_transactions["month"] = df_transactions["date"].dt.month
-                        unique_months = df_transactions["month"].unique()
-                        unique_months.sort()
-                        unique_months_names = [calendar.month_name[month] for month in unique_months]
-                        selected_filters[filter_name] = st.multiselect('Select month(s):', unique_months_names, key=f'select_{filter_name}')
+                    if filter_name == "date":
+                        date_range = st.date_input('Select dates:', value=(), key=f'select_{filter_name}')
+                        if len(date_range) > 0:
+                            transaction_params["start_date"] = date_range[0].isoformat()
+                        if len(date_range) > 1:
+                            transaction_params["end_date"] = date_range[1].isoformat()
 
                     if filter_name == "type":
-                        selected_filters[filter_name] = st.multiselect('Filter by type:', df_transactions["type"].unique(), key=f'select_{filter_name}')
-
-                    if filter_name == "origin_account":
-                        selected_filters[filter_name] = st.multiselect('Filter by origin account:', df_transactions["origin_account"].unique(), key=f'select_{filter_name}')
+                        available_transaction_types = cached_api_get("available/transaction_types", st.session_state.access_token)
+                        transaction_params["transaction_type"] = st.selectbox('Filter by type:', available_transaction_types, key=f'select_{filter_name}')
 
-                    if filter_name == "destination_account":
-                        selected_filters[filter_name] = st.multiselect('Filter by destination account:', df_transactions["destination_account"].unique(), key=f'select_{filter_name}')
+                    if filter_name == "account":
+                        # Every account, not only the ones displayed by the account filters (cached table)
+                        transaction_params["account"] = st.selectbox('Filter by account:', sorted(get_account_table()["name"].unique()), key=f'select_{filter_name}')
 
                     if filter_name == "budget":
-                        selected_filters[filter_name] = st.multiselect('Filter by budget:', df_transactions["budget"].unique(), key=f'select_{filter_name}')
+                        transaction_params["budget"] = st.selectbox('Filter by budget:', list(budget_id_to_name), format_func=budget_id_to_name.get, key=f'select_{filter_name}')
 
                     if filter_name == "recipient":
-                        selected_filters[filter_name] = st.multiselect('Filter by recipient:', df_transactions["recipient"].unique(), key=f'select_{filter_name}')
+                        available_recipients = cached_api_get("transaction/recipients", st.session_state.access_token)["existing recipients"]
+                        transaction_params["recipient"] = st.selectbox('Filter by recipient:', available_recipients, key=f'select_{filter_name}')
 
                     if filter_name == "category":
-                        selected_filters[filter_name] = st.multiselect('Filter by category:', df_transactions["category"].unique(), key=f'select_{filter_name}')
+                        available_categories = cached_api_get("transaction/categories", st.session_state.access_token)["existing categories"]
+                        transaction_params["category"] = st.selectbox('Filter by category:', available_categories, key=f'select_{filter_name}')
 
+            # Empty selections are not filters
+            transaction_params = {param: value for param, value in transaction_params.items() if value is not None}
 
-            # Apply filters sequentially
-            for filter_name, filter_value in selected_filters.items():
-                if filter_value:
-                    # Apply filter based on filter_name
-                    if filter_name == "month":
-                        month_to_num = {month: index for index, month in enumerate(calendar.month_name) if month}
-                        filter_value_nums = [month_to_num[month] for month in filter_value]
-                        df_transactions = df_transactions[df_transactions["month"].isin(filter_value_nums)]
 
-                    if filter_name == "type":
-                        df_transactions = df_transactions[df_transactions["type"].isin(filter_value)]
-                    
-                    if filter_name == "origin_account":
-                        df_transactions = df_transactions[df_transactions["origin_account"].isin(filter_value)]
-                    
-                    if filter_name == "destination_account":
-                        df_transactions = df_transactions[df_transactions["destination_account"].isin(filter_value)]
-                    
-                    if filter_name == "budget":
-                        df_transactions = df_transactions[df_transactions["budget"].isin(filter_value)]
-                    
-                    if filter_name == "recipient":
-                        df_transactions = df_transactions[df_transactions["recipient"].isin(filter_value)]
+        # Get transaction table, filtered & limited by the API
+        df_transactions = get_transaction_table(budget_id_to_name, params=transaction_params)
 
-                    if filter_name == "category":
-                        df_transactions = df_transactions[df_transactions["category"].isin(filter_value)]
+
+        # Sort by button
+        with sortby_col:
+            sort_by = st.selectbox('Sort by:', df_transactions.columns, key="sort_by_transactions")
+            df_transactions = df_transactions.sort_values(sort_by)
 
 
     # Interactive display of transactions
     with st.expander("View Transactions"):
-        st.dataframe(df_transactions)
-        credit_amount = df_transactions[df_transactions["type"] == "credit"]["amount"].apply(lambda x: float(x.split(" ")[0])).sum()
-        debit_amount = df_transactions[df_transactions["type"] == "debit"]["amount"].apply(lambda x: float(x.split(" ")[0])).sum()
+        display_table(df_transactions)
+        credit_amount = df_transactions.loc[df_transactions["type"] == "credit", "amount"].sum()
+        debit_amount = df_transactions.loc[df_transactions["type"] == "debit", "amount"].sum()
         evaluated_amount = credit_amount - debit_amount
         st.markdown(f"**Evaluated amount in transactions:** {evaluated_amount:.2f} €", unsafe_allow_html=True)
 
@@ -315,12 +287,13 @@ if page == pages[0]:
 if page == pages[1]: 
     st.title("Transactions")
 
-    # Get transaction table
+    # Get transaction table (the form tables are fetched at the same time)
+    prefetch_api_gets(["table/budget", "table/transaction", "table/account", "available/transaction_types", "transaction/categories"])
     df_budgets, budget_id_to_name = get_budget_table()
     df_transactions = get_transaction_table(budget_id_to_name)
     transaction_id_list = sorted(df_transactions.id.tolist())
-    current_transaction_categories = [category for category in df_transactions["category"].unique()]
-    current_transaction_categories.sort() # ADDED IN 0.2.1
+    # Sorted by the API, from its categories dictionary
+    current_transaction_categories = list(cached_api_get("transaction/categories", st.session_state.access_token)["existing categories"])
     if st.session_state.new_category: # ADDED IN 0.2.1
         current_transaction_categories.insert(0, st.session_state.new_category) # CHANGED IN 0.2.1
 
@@ -334,26 +307,16 @@ if page == pages[1]:
         with st.form(key="create_transaction_form"):
 
             # Get available transaction types
-            url = f"{api_url}/api/{api_version}/available/transaction_types"
-            available_transaction_types = requests.get(url, headers=st.session_state.headers)
-            available_transaction_types = available_transaction_types.json()
+            available_transaction_types = cached_api_get("available/transaction_types", st.session_state.access_token)
 
             # Get available accounts
-            url = f"{api_url}/api/{api_version}/table/account"
-            account_table = requests.get(url, headers=st.session_state.headers)
-            account_table = account_table.json()
-            account_table = account_table["account table"]
-            account_names = [account['name'] for account in account_table]
+            account_names = get_account_table()["name"].tolist()
             account_names.insert(0, "None")
     
             # Get available budgets
-            url = f"{api_url}/api/{api_version}/table/budget"
-            budget_table = requests.get(url, headers=st.session_state.headers)
-            budget_table = budget_table.json()
-            budget_table = budget_table["budget table"]
-            budget_names = [budget['name'] for budget in budget_table]
+            budget_names = df_budgets["name"].tolist()
             budget_names.insert(0, "None")
-            budget_months = [budget['month'] for budget in budget_table]
+            budget_months = df_budgets["month"].tolist()
             budget_months.insert(0, "None")
 
 
@@ -403,8 +366,8 @@ if page == pages[1]:
     if create_delete_choice_transaction == "Delete Transaction":
 
         with st.form(key="delete_transaction_form"):
-            st.subheader("Select transaction id to remove:")
-            transaction_id_to_remove = st.selectbox("Choose transaction id", transaction_id_list, key="transaction_id_choice")
+            st.subheader("Select transaction ids to remove:")
+            transaction_id_to_remove = st.multiselect("Choose transaction ids", transaction_id_list, key="transaction_id_choice")
 
             # Search button
             search_button = st.form_submit_button(label='Search')
@@ -413,22 +376,21 @@ if page == pages[1]:
                 st.session_state.search_transaction_by_id_button_clicked = True
                 st.session_state.transaction_id_to_remove = transaction_id_to_remove
 
-        if st.session_state.search_transaction_by_id_button_clicked:
-            st.write("Delete this transaction ?")
-            filtered_transaction_id = df_transactions[df_transactions["id"] == st.session_state.transaction_id_to_remove]
-            st.dataframe(filtered_transaction_id)
+        if st.session_state.search_transaction_by_id_button_clicked and st.session_state.transaction_id_to_remove:
+            st.write("Delete these transactions ?")
+            filtered_transaction_id = df_transactions[df_transactions["id"].isin(st.session_state.transaction_id_to_remove)]
+            display_table(filtered_transaction_id)
 
             # Separate form for delete confirmation
             with st.form(key="confirm_delete_form"):
-                submit_button = st.form_submit_button(label='Delete Transaction')
+                submit_button = st.form_submit_button(label='Delete Transactions')
 
-                # Request API when submit button is clicked
+                # Request API when submit button is clicked (one request for all the selected transactions)
                 if submit_button:
-                    delete_transaction(st.session_state.transaction_id_to_remove)
-                    st.success(f"Transaction {st.session_state.transaction_id_to_remove} has been deleted.")
+                    delete_transactions(st.session_state.transaction_id_to_remove)
                     # Reset session state
                     st.session_state.search_transaction_by_id_button_clicked = False
-                    st.session_state.transaction_id_to_remove = None
+                    st.session_state.transaction_id_to_remove = []
 
 ### END OF PAGE: TRANSACTIONS ###
 
@@ -437,18 +399,7 @@ if page == pages[1]:
 if page == pages[2]: 
     st.title("Analytics")
 
-    # Get transaction table
-    df_budgets, budget_id_to_name = get_budget_table()
-    df_transactions = get_transaction_table(budget_id_to_name)
-
-    df_cat = df_transactions[["date", "type", "amount", "category", "recipient"]]
-    df_cat["amount"] = df_cat["amount"].apply(lambda x: float(x.split(" ")[0])).astype(float) # Convert amount to float
-    df_cat["year"] = pd.to_datetime(df_cat["date"]).dt.year.astype(str)
-    df_cat["month"] = pd.to_datetime(df_cat["date"]).dt.month_name()
-    df_cat["weekday"] = pd.to_datetime(df_cat["date"]).dt.weekday.apply(lambda x: calendar.day_name[x])
-    df_time_series = df_cat.copy()
-
-    # Build charts
+    # Build charts, aggregations are computed by the API
     with st.expander("Bar plots"):
 
         plot_choice_col, transaction_type_col = st.columns(2)
@@ -457,54 +408,31 @@ if page == pages[2]:
         with transaction_type_col:
             transaction_type = st.selectbox("Transaction type:", ["debit", "credit"], key="transaction_type_analytics")
 
-            df_cat = df_cat[df_cat["type"] == transaction_type]
+            analytics_filters = {"transaction_type": transaction_type}
 
         if plot_choice == "Category" or plot_choice == "Recipient":
             temporal_choice = st.selectbox("Temporal choice:", ["", "Year", "Month", "Weekday"], key="temporal_choice_analytics")
-            if temporal_choice == "Year":
-                available_years_df_cat = [elt for elt in df_cat["year"].unique()]
-                available_years_df_cat.insert(0, "")
-                year_choice = st.selectbox("Choose year:", available_years_df_cat, key="year_choice_analytics")
-                if year_choice != "":
-                    df_cat = df_cat[df_cat["year"] == year_choice]
-
-            if temporal_choice == "Month":
-                available_months_df_cat = [elt for elt in df_cat["month"].unique()]
-                available_months_df_cat.insert(0, "")
-                month_choice = st.selectbox("Choose month:", available_months_df_cat, key="month_choice_analytics")
-                if month_choice != "":
-                    df_cat = df_cat[df_cat["month"] == month_choice]
-
-            if temporal_choice == "Weekday":
-                available_weekdays_df_cat = [elt for elt in df_cat["weekday"].unique()]
-                available_weekdays_df_cat.insert(0, "")
-                weekday_choice = st.selectbox("Choose weekday:", available_weekdays_df_cat, key="weekday_choice_analytics")
-                if weekday_choice != "":
-                    df_cat = df_cat[df_cat["weekday"] == weekday_choice]
-
-        if plot_choice == "Category":
-            df_cat = df_cat.groupby("category").agg({"amount": "sum"}).sort_values("amount", ascending=False).reset_index()
-            get_bar_chart(df_cat, "category", "amount")
-
-        elif plot_choice == "Recipient":
-            df_cat = df_cat.groupby("recipient").agg({"amount": "sum"}).sort_values("amount", ascending=False).reset_index()
-            get_bar_chart(df_cat, "recipient", "amount")
+            if temporal_choice != "":
+                temporal_key = temporal_choice.lower()
+                available_periods = [str(elt) for elt in get_analytics_periods(analytics_filters)[f"{temporal_key}s"]]
+                available_periods.insert(0, "")
+                period_choice = st.selectbox(f"Choose {temporal_key}:", available_periods, key=f"{temporal_key}_choice_analytics")
+                if period_choice != "":
+                    analytics_filters[temporal_key] = period_choice
+
+            group_by = plot_choice.lower()
+            df_cat = get_analytics_table("totals", {"group_by": group_by, **analytics_filters}, columns=[group_by, "amount"])
+            get_bar_chart(df_cat, group_by, "amount")
 
         elif plot_choice == "Temporal":
             display_by_temporal = st.selectbox("Display by:", ["", "Year", "Month", "Weekday"], key="display_by_temporal_analytics")
-            if display_by_temporal == "Year":
-                df_cat = df_cat.groupby(["year", "category"]).agg({"amount": "sum"}).sort_values("amount", ascending=False).reset_index()
-                get_bar_chart(df_cat, "year", "amount", legend=df_cat["category"].unique())
-
-            if display_by_temporal == "Month":
-                df_cat = df_cat.groupby(["month", "category"]).agg({"amount": "sum"}).sort_values("amount", ascending=False).reset_index()
-                get_bar_chart(df_cat, "month", "amount", legend=df_cat["category"].unique())
-
-            if display_by_temporal == "Weekday":
-                df_cat = df_cat.groupby(["weekday", "category"]).agg({"amount": "sum"}).sort_values("amount", ascending=False).reset_index()
-                get_bar_chart(df_cat, "weekday", "amount", legend=df_cat["category"].unique())
+            if display_by_temporal != "":
+                display_by = display_by_temporal.lower()
+                df_cat = get_analytics_table("temporal", {"display_by": display_by, **analytics_filters}, columns=[display_by, "category", "amount"])
+                get_bar_chart(df_cat, display_by, "amount", legend=df_cat["category"].unique())
 
     with st.expander("Time series"):
+        df_time_series = get_analytics_table("time_series", {}, columns=["year_month", "amount", "cumsum"])
         get_time_series(df_time_series)
 
 ### END OF PAGE: ANALYTICS ###
@@ -522,7 +450,7 @@ if page == pages[3]:
     if st.button("Check API status", key="check_api_status_button"):
         # Request API
         url = f"{api_url}/api/{api_version}/status"
-        response = requests.get(url)
+        response = get_http_session().get(url)
         if response.status_code == 200:
             st.success(response.json())
         else:
@@ -543,9 +471,7 @@ if page == pages[3]:
             with st.form(key="create_account_form"):
 
                 # Get available account types
-                url = f"{api_url}/api/{api_version}/available/account_types"
-                available_account_types = requests.get(url, headers=st.session_state.headers)
-                available_account_types = available_account_types.json()
+                available_account_types = cached_api_get("available/account_types", st.session_state.access_token)
                 available_account_types = available_account_types["available account types"]
 
 
@@ -559,8 +485,9 @@ if page == pages[3]:
                 # Request API when submit button is clicked
                 if submit_button:
                     url = f"{api_url}/api/{api_version}/create/account?account_name={account_name}&account_type={account_type}&account_balance={account_balance}"
-                    response = requests.post(url, headers=st.session_state.headers)
+                    response = get_http_session().post(url, headers=st.session_state.headers)
                     if response.status_code == 200:
+                        invalidate_api_cache()
                         st.success(response.json())
                     else:
                         st.error("An error occurred.")
@@ -572,9 +499,7 @@ if page == pages[3]:
             with st.form(key="delete_account_form"):
 
                 # Get available accounts
-                url = f"{api_url}/api/{api_version}/table/account"
-                account_table = requests.get(url, headers=st.session_state.headers)
-                account_table = account_table.json()
+                account_table = cached_api_get("table/account", st.session_state.access_token)
                 account_table = account_table["account table"]
 
                 if not account_table:
@@ -591,8 +516,9 @@ if page == pages[3]:
                 if submit_button:
                     account_id_to_delete = next((account[0] for account in account_table if account[1] == account_name_to_delete), None)
                     url = f"{api_url}/api/{api_version}/delete/account?account_id={account_id_to_delete}"
-                    response = requests.delete(url, headers=st.session_state.headers)
+                    response = get_http_session().delete(url, headers=st.session_state.headers)
                     if response.status_code == 200:
+                        invalidate_api_cache()
                         st.success(response.json())
                     else:
                         st.error("An error occurred.")
@@ -603,7 +529,7 @@ if page == pages[3]:
     # Budget Column
     with col_budget:
         # Button to choose : Create | Delete (budget)
-        create_delete_choice_budget = st.radio("Choose", ["Create Budget", "Delete Budget"], key="create_delete_choice_budget")
+        create_delete_choice_budget = st.radio("Choose", ["Create Budget", "Rollover Budgets", "Delete Budget"], key="create_delete_choice_budget")
 
         # Create budget choice
         if create_delete_choice_budget == "Create Budget":
@@ -619,22 +545,45 @@ if page == pages[3]:
                 # Request API when submit button is clicked
                 if submit_button:
                     url = f"{api_url}/api/{api_version}/create/budget?budget_name={budget_name}&budget_month={budget_month}&budget_amount={budget_amount}"
-                    response = requests.post(url, headers=st.session_state.headers)
+                    response = get_http_session().post(url, headers=st.session_state.headers)
                     if response.status_code == 200:
+                        invalidate_api_cache()
                         st.success(response.json())
                     else:
                         st.error("An error occurred.")
                         st.write(response)
 
 
+        # Rollover budgets choice
+        if create_delete_choice_budget == "Rollover Budgets":
+            with st.form(key="rollover_budget_form"):
+
+                # Form
+                st.subheader("Copy every budget of a month to another month.")
+                source_month = st.selectbox("From month", months, key="budget_month_rollover_source")
+                target_month = st.selectbox("To month", months, key="budget_month_rollover_target")
+                carry_over = st.checkbox("Carry over unspent amounts", key="budget_rollover_carry_over")
+                submit_button = st.form_submit_button(label='Rollover Budgets')
+
+                # Request API when submit button is clicked
+                if submit_button:
+                    url = f"{api_url}/api/{api_version}/budget/rollover"
+                    params = {"source_month": source_month, "target_month": target_month, "carry_over": carry_over}
+                    response = get_http_session().post(url, params=params, headers=st.session_state.headers)
+                    if response.status_code == 200:
+                        invalidate_api_cache()
+                        st.success(response.json()["message"])
+                    else:
+                        st.error("An error occurred.")
+                        st.write(response)
+
+
         # Delete budget choice
         if create_delete_choice_budget == "Delete Budget":
             with st.form(key="delete_budget_form"):
 
                 # Get available budgets
-                url = f"{api_url}/api/{api_version}/table/budget"
-                budget_table = requests.get(url, headers=st.session_state.headers)
-                budget_table = budget_table.json()
+                budget_table = cached_api_get("table/budget", st.session_state.access_token)
                 budget_table = budget_table["budget table"]
 
                 if not budget_table:
@@ -644,7 +593,7 @@ if page == pages[3]:
                 # Form
                 st.subheader("Please choose an account to delete in the list below.")
                 st.warning("This will delete all budget related transactions")
-                budget_name_to_delete, budget_month_to_delete = st.selectbox("Choose budget", [(budget[1], budget[2]) for budget in budget_table], key="budget_name_delete")
+                budget_name_to_delete, budget_month_to_delete = st.selectbox("Choose budget", [(budget["name"], budget["month"]) for budget in budget_table], key="budget_name_delete")
                 submit_button = st.form_submit_button(label='Delete Budget')
 
 
@@ -652,32 +601,25 @@ if page == pages[3]:
                 if submit_button:
 
                     # Get budget id to delete
-                    budget_id_to_delete = next((budget[0] for budget in budget_table if budget[1] == budget_name_to_delete), None)
+                    budget_id_to_delete = next((budget["id"] for budget in budget_table if budget["name"] == budget_name_to_delete and budget["month"] == budget_month_to_delete), None)
 
-                    # Get transactions id to delete
-                    url = f"{api_url}/api/{api_version}/table/transaction"
-                    transaction_table = requests.get(url, headers=st.session_state.headers)
-                    transaction_table = transaction_table.json()
-                    transaction_table = transaction_table["transaction table"]
-                    transaction_id_related_budget = [transaction[0] for transaction in transaction_table if transaction[6] == budget_id_to_delete]           
-
-
-                    # Delete all related transactions
-                    for transaction_to_delete in transaction_id_related_budget:
-
-                        url = f"{api_url}/api/{api_version}/delete/transaction?transaction_id={transaction_to_delete}"
-                        response = requests.delete(url, headers=st.session_state.headers)
-                        if response.status_code == 200:
-                            st.success(response.json())
-                        else:
-                            st.error("An error occurred.")
-                            st.write(response)                    
+                    # Delete all related transactions, reverted on the accounts by the API in one statement (404: no related transaction)
+                    url = f"{api_url}/api/{api_version}/delete/transactions"
+                    response = get_http_session().delete(url, params={"budget": budget_id_to_delete}, headers=st.session_state.headers)
+                    if response.status_code == 200:
+                        invalidate_api_cache()
+                        st.success(response.json()["message"])
+                    elif response.status_code != 404:
+                        st.error("An error occurred.")
+                        st.write(response)
+                        st.stop()
 
 
                     # Delete budget
                     url = f"{api_url}/api/{api_version}/delete/budget?budget_id={budget_id_to_delete}"
-                    response = requests.delete(url, headers=st.session_state.headers)
+                    response = get_http_session().delete(url, headers=st.session_state.headers)
                     if response.status_code == 200:
+                        invalidate_api_cache()
                         st.success(response.json())
                     else:
                         st.error("An error occurred.")
@@ -0,0 +1,63 @@
+"""
+UNIT TESTS - API RESPONSES
+"""
+
+"""
+LIB
+"""
+from datetime import datetime
+import os
+import sys
+import uuid
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("fastapi")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "api"))
+from api_responses import rows_to_arrow
+
+
+"""
+VARS
+"""
+# A row of /table/transaction, as returned by asyncpg (SELECT * FROM transactions)
+transaction_row = {
+    'id': uuid.uuid4(),
+    'date': datetime(2024, 8, 1, 12, 30),
+    'type': "transfert",
+    'amount': 42.5,
+    'origin_account': "checking",
+    'destination_account': "saving",
+    'origin_account_id': uuid.uuid4(),
+    'destination_account_id': None,
+    'budget': uuid.uuid4(),
+    'recipient': "Bank",
+    'category': None,
+    'description': "",
+    'category_id': None,
+    'recipient_id': 3
+}
+
+
+"""
+TESTS
+"""
+def test_rows_to_arrow_transaction_row():
+    arrow_table = rows_to_arrow([transaction_row, {**transaction_row, 'id': uuid.uuid4(), 'destination_account_id': uuid.uuid4(), 'category': "Savings", 'category_id': 1}])
+
+    assert arrow_table.num_rows == 2
+    assert arrow_table.column_names == list(transaction_row.keys())
+    assert arrow_table.schema.field('amount').type == pa.float64()
+    assert arrow_table.schema.field('date').type == pa.timestamp('us')
+    assert arrow_table.schema.field('category_id').type == pa.int32()
+    assert arrow_table.schema.field('recipient_id').type == pa.int32()
+    assert arrow_table.schema.field('id').type == pa.string()
+    assert arrow_table.schema.field('destination_account_id').type == pa.string()
+    assert arrow_table.column('id')[0].as_py() == str(transaction_row['id'])
+    assert arrow_table.column('category').to_pylist() == [None, "Savings"]
+
+
+def test_rows_to_arrow_empty():
+    assert rows_to_arrow([]).num_rows == 0
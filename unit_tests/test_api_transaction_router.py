@@ -0,0 +1,64 @@
+"""
+UNIT TESTS - API TRANSACTION ROUTER
+"""
+
+"""
+LIB
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("asyncpg")
+pytest.importorskip("httpx") # fastapi.testclient
+
+# Same variables as dev_test/api.env, the API modules read them on import
+for env_var, value in (("ALGORITHM", "HS256"),
+                       ("ACCESS_TOKEN_EXPIRATION", "180"),
+                       ("CRYPT_CONTEXT_SCHEME", "argon2"),
+                       ("AUTHORIZED_USERS", "root"),
+                       ("BANK_APP_API_TOKEN_SECRET_KEY", "unit_tests")):
+    os.environ.setdefault(env_var, value)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "api"))
+from fastapi.testclient import TestClient
+from api_main import app
+from api_auth_router import get_current_user
+from api_vars import api_version
+
+
+"""
+VARS
+"""
+import_url = f"/api/{api_version}/import/transaction"
+
+
+"""
+FIXTURES
+"""
+@pytest.fixture
+def client():
+    # No lifespan: the database pool is never created, the import must fail before writing anything
+    app.dependency_overrides[get_current_user] = lambda: "root"
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+"""
+TESTS
+"""
+def test_import_csv_with_nul_byte(client):
+    body = b"transaction_date,transaction_type,transaction_amount\n2024-08-01,debit,\x0012\n"
+    response = client.post(import_url, content=body, headers={"content-type": "text/csv"})
+
+    assert response.status_code == 400
+
+
+def test_import_csv_with_oversized_field(client):
+    body = b"transaction_date,description\n2024-08-01," + b"x" * 200000 + b"\n"
+    response = client.post(import_url, content=body, headers={"content-type": "text/csv"})
+
+    assert response.status_code == 400
+    assert "Could not parse the import" in response.json()["detail"]
@@ -0,0 +1,103 @@
+"""
+Benchmark the JSON serialization of a transaction table: FastAPI default path vs orjson.
+"""
+
+# LIBS
+import argparse
+from datetime import datetime, timedelta
+import json
+import random
+import statistics
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+import orjson
+
+
+# Args parser
+parser = argparse.ArgumentParser(description='Benchmark the JSON serialization of a transaction table')
+parser.add_argument('--rows', type=int, default=100000, help='Number of transactions in the table')
+parser.add_argument('--runs', type=int, default=5, help='Number of runs per serializer')
+
+
+params = parser.parse_args()
+
+
+# FUNCTIONS
+
+def generate_transaction_table(rows: int) -> dict:
+    """
+    Generate a transaction table shaped like the rows of /table/transaction (asyncpg records as dicts).
+    """
+    started = datetime(2024, 1, 1)
+    categories = ["food", "rent", "transport", "leisure", "health", "salary"]
+    accounts = ["checking", "saving", "investment"]
+    budget_ids = [uuid.uuid4() for _ in range(12)]
+
+    transaction_table = [{
+        'id': uuid.uuid4(),
+        'date': started + timedelta(minutes=15 * row),
+        'type': random.choice(("debit", "credit", "transfert")),
+        'amount': round(random.uniform(1, 2000), 2),
+        'origin_account': random.choice(accounts),
+        'destination_account': random.choice(accounts),
+        'budget': random.choice(budget_ids),
+        'recipient': f"recipient {row % 500}",
+        'category': random.choice(categories),
+        'description': f"transaction {row}"
+    } for row in range(rows)]
+
+    return {'transaction table': transaction_table, 'next_cursor': None}
+
+
+def serialize_default(content: dict) -> bytes:
+    """
+    FastAPI default path: jsonable_encoder, then starlette's JSONResponse.render.
+    """
+    encoded = jsonable_encoder(content)
+    return json.dumps(encoded, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def serialize_orjson(content: dict) -> bytes:
+    """
+    orjson path: the content is returned as a FastJSONResponse (see api_responses), UUIDs & datetimes are native.
+    """
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def benchmark(serializer, content: dict, runs: int) -> tuple:
+    """
+    Returns the median duration (seconds) and the size (bytes) of the serialized content.
+    """
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = serializer(content)
+        durations.append(time.perf_counter() - started)
+
+    return statistics.median(durations), len(body)
+
+
+# MAIN FUNCTION
+
+def main(params) -> None:
+    """
+    Serialize the same transaction table with both paths and print the median durations.
+    """
+    content = generate_transaction_table(params.rows)
+
+    default_duration, default_size = benchmark(serialize_default, content, params.runs)
+    orjson_duration, orjson_size = benchmark(serialize_orjson, content, params.runs)
+
+    print(f"{params.rows} rows, median of {params.runs} runs")
+    print(f"jsonable_encoder + json.dumps: {default_duration * 1000:.1f} ms ({default_size / 1e6:.1f} MB)")
+    print(f"orjson:                        {orjson_duration * 1000:.1f} ms ({orjson_size / 1e6:.1f} MB)")
+    print(f"speedup: x{default_duration / orjson_duration:.1f}")
+
+
+if __name__ == "__main__":
+    main(params)
+
+# CLI example (in the API environment)
+# python3 benchmark_json_serialization.py --rows 100000 --runs 5